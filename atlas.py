@@ -0,0 +1,158 @@
+#! /usr/bin/env python3
+
+from hashlib import blake2b
+import os
+from struct import Struct
+
+from numpy import array, asarray, float32, memmap, ndarray, uint8
+from PIL import Image, ImageDraw, ImageFont
+
+from protocol import FONT_CODES, FONT_PATHS, SPRITE_PATHS, Glyph
+
+CACHE_PATH = 'atlas.cache'
+
+
+class Atlas:
+    """Glyph images packed into one RGBA texture, with the uv rect of each.
+
+    pixels is (height, width, 4) uint8, bottom row first, as glTexImage2D wants it.
+    """
+    PADDING = 1
+    # magic, format, fingerprint of the sources, width, height, glyph count, names length
+    HEADER = Struct('<4sI8sIIII')
+    MAGIC, FORMAT = b'RGAT', 1
+
+    def __init__(self, names: list, pixels: ndarray, uvs: ndarray):
+        self.names = names
+        self.pixels = pixels
+        self.uvs = uvs
+        self.glyphs = {name: Glyph(i, tuple(uv))
+                       for i, (name, uv) in enumerate(zip(self.names, self.uvs.tolist()))}
+
+    @property
+    def size(self) -> tuple:
+        height, width, _ = self.pixels.shape
+        return width, height
+
+    @classmethod
+    def from_images(cls, images: dict):
+        names = list(images)
+        image, rects = Atlas.pack([images[name] for name in names])
+        width, height = image.size
+        # Textures are uploaded bottom row first, so v runs up from the bottom
+        uvs = array([(x0 / width, 1 - y1 / height, x1 / width, 1 - y0 / height)
+                     for x0, y0, x1, y1 in rects], dtype=float32)
+        return cls(names, asarray(image)[::-1].copy(), uvs)
+
+    @staticmethod
+    def pack(images: list) -> tuple:
+        """Shelf-pack images into one power-of-two RGBA image, returning it and their rects"""
+        pad = Atlas.PADDING
+        width = Atlas.power_of_two(max(256, max(im.size[0] for im in images) + 2 * pad))
+        order = sorted(range(len(images)), key=lambda i: -images[i].size[1])
+        rects = [None] * len(images)
+        x, y, shelf = pad, pad, 0
+        for i in order:
+            w, h = images[i].size
+            if x + w + pad > width:
+                x, y, shelf = pad, y + shelf + pad, 0
+            rects[i] = (x, y, x + w, y + h)
+            x += w + pad
+            shelf = max(shelf, h)
+        atlas = Image.new('RGBA', (width, Atlas.power_of_two(y + shelf + pad)), (0, 0, 0, 255))
+        for im, (x0, y0, _, _) in zip(images, rects):
+            atlas.paste(im.convert('RGBA'), (x0, y0))
+        return atlas, rects
+
+    @staticmethod
+    def power_of_two(n: int) -> int:
+        return 1 << (n - 1).bit_length()
+
+    @classmethod
+    def from_files(cls, paths: list = FONT_PATHS + SPRITE_PATHS):
+        return cls.from_images({path: Image.open(path) for path in paths})
+
+    @classmethod
+    def from_font(cls, font_file: str, size: int = 13, paths: list = SPRITE_PATHS):
+        font = ImageFont.truetype(font_file, size)
+        ascent, descent = font.getmetrics()
+        cell = (round(font.getlength('M')), ascent + descent)
+        images = {}
+        for code, path in zip(FONT_CODES, FONT_PATHS):
+            glyph = Image.new('RGB', cell, (0, 0, 0))
+            ImageDraw.Draw(glyph).text((0, 0), chr(code), font=font, fill=(255, 255, 255))
+            images[path] = glyph
+        images.update({path: Image.open(path) for path in paths})
+        return cls.from_images(images)
+
+    @staticmethod
+    def fingerprint(sources: list) -> bytes:
+        """A digest of the names, sizes and modification times of the source files"""
+        digest = blake2b(digest_size=8)
+        for source in sources:
+            stat = os.stat(source)
+            digest.update(('%s:%d:%d;' % (source, stat.st_size, stat.st_mtime_ns)).encode())
+        return digest.digest()
+
+    @classmethod
+    def cached(cls, path: str = CACHE_PATH, font_file: str = None):
+        """The atlas from the cache file at path, which is first rebuilt from the glyph
+        files (or font_file) if they have changed since it was written"""
+        sources = [font_file] + SPRITE_PATHS if font_file else FONT_PATHS + SPRITE_PATHS
+        fingerprint = Atlas.fingerprint(sources)
+        try:
+            return cls.load(path, fingerprint)
+        except (OSError, ValueError):
+            pass
+        atlas = cls.from_font(font_file) if font_file else cls.from_files()
+        try:
+            atlas.save(path, fingerprint)
+        except OSError:
+            pass
+        return atlas
+
+    def save(self, path: str, fingerprint: bytes):
+        names = '\n'.join(self.names).encode()
+        width, height = self.size
+        # Written whole to a temporary file first, so a reader never sees half of one
+        partial = '%s.%d' % (path, os.getpid())
+        with open(partial, 'wb') as f:
+            f.write(Atlas.HEADER.pack(Atlas.MAGIC, Atlas.FORMAT, fingerprint, width, height,
+                                      len(self.names), len(names)))
+            f.write(names)
+            f.write(self.uvs.astype('<f4').tobytes())
+            f.write(self.pixels.tobytes())
+        os.replace(partial, path)
+
+    @classmethod
+    def load(cls, path: str, fingerprint: bytes = None):
+        """Map a cache file into memory; the pixels are read as the texture is uploaded"""
+        data = memmap(path, dtype=uint8, mode='r')
+        if len(data) < Atlas.HEADER.size:
+            raise ValueError('%s is truncated' % path)
+        magic, version, stored, width, height, count, names_length = \
+            Atlas.HEADER.unpack_from(data)
+        if magic != Atlas.MAGIC or version != Atlas.FORMAT:
+            raise ValueError('%s is not an atlas cache' % path)
+        if fingerprint is not None and stored != fingerprint:
+            raise ValueError('%s is out of date' % path)
+        offset = Atlas.HEADER.size
+        names = bytes(data[offset:offset + names_length]).decode().split('\n')
+        offset += names_length
+        uvs = data[offset:offset + 16 * count].view('<f4').reshape(count, 4)
+        offset += uvs.nbytes
+        pixels = data[offset:offset + 4 * width * height].reshape(height, width, 4)
+        if pixels.size != 4 * width * height:
+            raise ValueError('%s is truncated' % path)
+        return cls(names, pixels, uvs.astype(float32))
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description='Build the glyph atlas cache the renderer starts from')
+    parser.add_argument('--font', metavar='TTF', help='draw the glyphs from a font file')
+    parser.add_argument('--output', default=CACHE_PATH)
+    args = parser.parse_args()
+    atlas = Atlas.cached(args.output, args.font)
+    print('%s: %d glyphs, %dx%d' % (args.output, len(atlas.names), *atlas.size))
@@ -0,0 +1,134 @@
+#! /usr/bin/env python3
+"""Benchmarks for level generation, ticking and render-list construction.
+
+Results are printed as JSON so runs from two commits can be compared:
+
+    python3 bench.py --output before.json
+    python3 bench.py --compare before.json
+"""
+
+from argparse import ArgumentParser
+import json
+import pickle
+import random
+from statistics import mean, median
+import sys
+from time import perf_counter
+
+from fighters import Player
+from headless import HeadlessEndpoint
+from maps import Dungeon
+from objects import Object
+from protocol import FrameEncoder
+from rogue import GameManager
+from vector import vector
+
+
+def timed(func, repeat: int, setup=lambda: None) -> dict:
+    samples = []
+    for _ in range(repeat):
+        arg = setup()
+        t0 = perf_counter()
+        func(arg)
+        samples.append((perf_counter() - t0) * 1000)
+    return {'min_ms': min(samples), 'median_ms': median(samples),
+            'mean_ms': mean(samples), 'max_ms': max(samples)}
+
+
+def bench(size: int, density: int, repeat: int, ticks: int, seed: int) -> dict:
+    random.seed(seed)
+    script = HeadlessEndpoint.wander(seed)
+    game = GameManager(HeadlessEndpoint(script), tick_rate=None, prefetch=False, seed=seed)
+    dims = vector([size, size, 2])
+    results = {'size': size, 'density': density}
+
+    results['gen_map'] = timed(lambda _: Dungeon(game, dims), repeat)
+
+    def fresh_map():
+        random.seed(seed)
+        game.map = Dungeon(game, dims)
+        return game.map
+
+    results['populate'] = timed(lambda level: level.populate(density), repeat, fresh_map)
+
+    level = fresh_map()
+    level.populate(density)
+    game.player = Player(game, level.player_start)
+    results['entities'] = len(level.entities)
+
+    def press():
+        game.keypresses = next(script)
+
+    results['map_update'] = timed(lambda _: game.map.update(), ticks, press)
+    results['mapslice_renders'] = timed(lambda _: game.map.mapslice.renders, repeat)
+    results['map_renders'] = timed(lambda _: game.map.renders, repeat)
+
+    rng = random.Random(seed)
+    pairs = [(vector([rng.randrange(size), rng.randrange(size), 1]),
+              vector([rng.randrange(size), rng.randrange(size), 1])) for _ in range(1000)]
+    results['bresenham_1000'] = timed(
+        lambda _: [Object.bresenham(a, b) for a, b in pairs], repeat)
+    tiles = [game.map.tile(a) for a, _ in pairs]
+    results['visible_1000'] = timed(
+        lambda _: [tile.visible(b) for tile, (_, b) in zip(tiles, pairs)], repeat)
+    results['visible_player_1000'] = timed(
+        lambda _: [tile.visible(game.player.position) for tile in tiles], repeat)
+
+    renders = game.map.renders
+    encoder = FrameEncoder()
+    keyframe = encoder.encode(game.map.instances, game.state, game.player.position)
+    deltas = []
+    for _ in range(ticks):
+        press()
+        game.map.update()
+        deltas.append(len(encoder.encode(game.map.instances, game.state,
+                                         game.player.position)))
+    results['payload'] = {'renders': len([obj for obj in renders if obj is not None]),
+                          'pickle_bytes': len(pickle.dumps(renders)),
+                          'keyframe_bytes': len(keyframe),
+                          'mean_delta_bytes': mean(deltas)}
+    return results
+
+
+def compare(before: dict, after: dict):
+    """Print the ratio after/before of every median timing found in both runs"""
+    runs = {(run['size'], run['density']): run for run in before['runs']}
+    for run in after['runs']:
+        old = runs.get((run['size'], run['density']))
+        if old is None:
+            continue
+        for name, result in run.items():
+            if isinstance(result, dict) and 'median_ms' in result and name in old:
+                ratio = result['median_ms'] / max(old[name]['median_ms'], 1e-9)
+                print('%5d %2d %-22s %10.3f ms -> %10.3f ms  x%.2f'
+                      % (run['size'], run['density'], name,
+                         old[name]['median_ms'], result['median_ms'], ratio))
+
+
+def main(argv: list = None):
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[41, 81, 161])
+    parser.add_argument('--densities', type=int, nargs='+', default=[1, 3])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--ticks', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', metavar='JSON', help='write results here instead of stdout')
+    parser.add_argument('--compare', metavar='JSON', help='earlier results to compare against')
+    args = parser.parse_args(argv)
+
+    results = {'python': sys.version.split()[0], 'seed': args.seed,
+               'runs': [bench(size, density, args.repeat, args.ticks, args.seed)
+                        for size in args.sizes for density in args.densities]}
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    elif not args.compare:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -12,7 +12,16 @@ HUD_MESSAGE = 4
 
 GAME_WIDTH = 960
 GAME_HEIGHT = 540
+TICK_RATE = 8.0
+MAP_SIZE = (41, 41, 2)
+WORLD_SIZE = (4096, 4096, 2)
+CHUNK_SIZE = 16
+
 DISP_WIDTH = 21
 DISP_HEIGHT = 21
+FOV_RADIUS = max(DISP_WIDTH, DISP_HEIGHT) // 2
+FLOW_RADIUS = 2 * FOV_RADIUS
 
 OBJECT_SHADOW = 10
+
+TERRAIN_FLAG = 1
@@ -5,42 +5,53 @@ from vector import vector
 
 
 class Effect(Object):
+    period = 1
 
     def __init__(self, *args, solid: bool = False, transparent: bool = True, **kwargs):
         kwargs.update({'solid': solid, 'transparent': transparent})
         super().__init__(*args, **kwargs)
 
+    def _get_position(self):
+        return super()._get_position()
+
+    def _set_position(self, v: vector):
+        self.game.map.entities.move(self, v)
+        super()._set_position(v)
+
+    position = property(_get_position, _set_position)
+
     def update(self):
         self.position += self.velocity
 
     def spawn(self):
-        self.game.map.effects.append(self)
+        self.game.map.add(self)
 
     def destroy(self):
-        if self in self.game.map.effects:
-            del self.game.map.effects[self.game.map.effects.index(self)]
+        self.game.map.remove(self)
 
 
-class HitMarker(Effect):
+class Particle:
+    """A kind of purely visual effect, simulated in bulk by the map's Particles pool"""
+    sprite = '*'
+    lifespan = 3
+    offset = vector([0, 0, 0])
+    velocity = (0, 0, 0)
+    spread = 0
 
-    def __init__(self, *args, sprite: str = '*', **kwargs):
-        kwargs.update({'sprite': sprite})
-        super().__init__(*args, **kwargs)
-        self.position += vector([0, 1, 0])
-        self.lifespan = 3
+    @classmethod
+    def spawn(cls, game_ref, position: vector, count: int = 1):
+        glyph = game_ref.textures['font/%03d.png' % ord(cls.sprite)]
+        game_ref.map.particles.spawn(position + cls.offset, glyph.index, cls.lifespan,
+                                     cls.velocity, count, cls.spread)
 
-    def update(self):
-        if self.lifespan <= 0:
-            self.destroy()
-        self.lifespan -= 1
-        super().update()
 
+class HitMarker(Particle):
+    offset = vector([0, 1, 0])
 
-class BonfireFlame(HitMarker):
 
-    def __init__(self, *args, sprite: str = '*', **kwargs):
-        kwargs.update({'sprite': sprite})
-        super().__init__(*args, **kwargs)
+class BonfireFlame(HitMarker):
+    lifespan = 2
+    spread = 1
 
 
 class StoneGlare(Effect):
@@ -1,7 +1,5 @@
 #! /usr/bin/env python3
 
-from random import randrange
-
 from constants import *
 from objects import Object
 from effects import HitMarker, StoneGlare, Fireball
@@ -14,23 +12,23 @@ class Fighter(Object):
                  **kwargs):
         self.max_hp, self.attack, self.defense, self.speed = stats
         self.hp = self.max_hp
-        self.underneath = None
         kwargs.update({'transparent': transparent})
         super().__init__(*args, **kwargs)
-        self.move_counter = 1
 
     def _get_position(self):
         return super()._get_position()
 
     def _set_position(self, v: vector):
-        if self.underneath is not None:
-            self.game.map[self.position] = self.underneath
-        self.underneath = self.game.map[v]
         self.game.map[v] = self
         super()._set_position(v)
+        self.game.map.tile(v).enter(self)
 
     position = property(_get_position, _set_position)
 
+    @property
+    def period(self) -> int:
+        return 5 - self.speed
+
     @property
     def render(self):
         if self.visible(self.game.player.position):
@@ -38,23 +36,15 @@ class Fighter(Object):
         else:
             return None
 
-    def update(self):
-        if self.move_counter == 0:
-            super().update()
-        if self.underneath is not None:
-            self.underneath.update()
-        self.move_counter += 1
-        self.move_counter %= 5 - self.speed
-
     def deal_damage(self, target: Object):
         damage = max((self.attack - target.defense, 0))
         target.take_damage(damage)
 
     def take_damage(self, damage: int):
-        HitMarker(self.game, self.position).spawn()
+        HitMarker.spawn(self.game, self.position)
         self.hp -= damage
         if self.hp <= 0:
-            self.game.map[self.position] = self.underneath
+            self.game.map.remove(self)
 
 
 class Player(Fighter):
@@ -67,14 +57,16 @@ class Player(Fighter):
 
     def update(self):
         kp = self.game.keypresses
-        if self.move_counter == 0:
-            self.velocity = vector([kp.get('d', 0) - kp.get('a', 0),
-                                    kp.get('s', 0) - kp.get('w', 0),
-                                    0])
+        self.velocity = vector([kp.get('d', 0) - kp.get('a', 0),
+                                kp.get('s', 0) - kp.get('w', 0),
+                                0])
         next_obj = self.game.map[self.position + self.velocity]
         if hasattr(next_obj, 'take_damage') and next_obj is not self:
             self.deal_damage(next_obj)
         super().update()
+        for item in self.game.map.entities.at(self.position):
+            if hasattr(item, 'pickup'):
+                item.pickup()
 
     def take_damage(self, damage: int):
         # self.game.events.append(HUD_MESSAGE)
@@ -92,20 +84,17 @@ class Goblin(Fighter):
 
     def update(self):
         visible = self.visible(self.game.player.position)
-        if visible and self.move_counter == 0:
+        if visible:
             dist = visible
-            d_pos = self.game.player.position - self.position
             if dist >= 2:
-                v = vector(map(lambda x: int(round(x / dist)), d_pos))
-                self.velocity = v
+                self.velocity = self.game.map.flow.step(self.position)
             elif self.game.player.hp > 0:
                 self.deal_damage(self.game.player)
             else:
                 pass
-        elif self.move_counter == 0:
-            self.velocity = vector([randrange(-1, 2) for _ in range(2)] + [0])
         else:
-            self.velocity = vector([0, 0, 0])
+            ai = self.game.random['ai']
+            self.velocity = vector([ai.randrange(-1, 2), ai.randrange(-1, 2), 0])
         super().update()
 
 
@@ -129,7 +118,7 @@ class Gorgon(Fighter):
         dist = self.visible(self.game.player.position)
         if dist:
             self.explored = True
-        if 0 < dist < 10 and self.move_counter == 0:
+        if 0 < dist < 10:
             StoneGlare(self.game, self.game.player.position).spawn()
         super().update()
 
@@ -144,9 +133,10 @@ class Wizard(Fighter):
 
     def update(self):
         dist = self.visible(self.game.player.position)
-        if 0 < dist < 10 and self.move_counter == self.fireball_counter == 0:
+        if 0 < dist < 10 and self.fireball_counter == 0:
             Fireball(self.game, self.position, parent=self).spawn()
-        elif self.move_counter == 0 and not dist:
-            self.velocity = vector([randrange(-1, 2) for _ in range(2)] + [0])
+        elif not dist:
+            ai = self.game.random['ai']
+            self.velocity = vector([ai.randrange(-1, 2), ai.randrange(-1, 2), 0])
         self.fireball_counter = (self.fireball_counter + 1) % 5
         super().update()
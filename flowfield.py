@@ -0,0 +1,75 @@
+#! /usr/bin/env python3
+
+from numpy import arange, argmin, array, full, ix_, stack, zeros
+
+from vector import vector
+
+# Orthogonal steps first, so that ties between equally short routes go straight
+STEPS = ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+UNREACHED = 2**30
+
+
+class FlowField:
+    """Walking distance to the origin over a (2r+1, 2r+1) window, with the way downhill.
+
+    The distances come from a breadth-first search by 8-way moves over open tiles,
+    run as whole-window array operations, one per step, for at most 2r steps. Every
+    cell then knows the neighbour one step nearer the origin, so any number of
+    monsters can look up their next move in O(1).
+    """
+
+    def __init__(self, game_map, origin: vector, radius: int):
+        self.origin = ox, oy, oz = tuple(origin)
+        self.radius = radius
+        self.version = game_map.version
+        y_max, x_max, _ = game_map.solid.shape
+        ys = arange(oy - radius, oy + radius + 1) % y_max
+        xs = arange(ox - radius, ox + radius + 1) % x_max
+        size = 2 * radius + 1
+        # One cell of closed padding around the window keeps every shift in bounds
+        passable = zeros((size + 2, size + 2), dtype=bool)
+        passable[1:-1, 1:-1] = ~game_map.solid[ix_(ys, xs)][:, :, oz]
+        distance = full((size + 2, size + 2), UNREACHED)
+        distance[radius + 1, radius + 1] = 0
+        frontier = distance == 0
+        open_ = passable & ~frontier
+        for step in range(1, 2 * radius + 1):
+            # The 3x3 neighbourhood of the frontier, dilated along rows then columns
+            rows = frontier.copy()
+            rows[:, 1:] |= frontier[:, :-1]
+            rows[:, :-1] |= frontier[:, 1:]
+            grown = rows.copy()
+            grown[1:] |= rows[:-1]
+            grown[:-1] |= rows[1:]
+            grown &= open_
+            if not grown.any():
+                break
+            distance[grown] = step
+            open_ &= ~grown
+            frontier = grown
+        self.distance = distance[1:-1, 1:-1]
+        neighbours = stack([distance[1 + dy:size + 1 + dy, 1 + dx:size + 1 + dx]
+                            for dx, dy in STEPS])
+        self.steps = array(STEPS)[argmin(neighbours, axis=0)]
+
+    def _local(self, position: vector) -> tuple:
+        x, y, _ = position
+        ox, oy, _ = self.origin
+        lx, ly = x - ox + self.radius, y - oy + self.radius
+        if 0 <= lx < len(self.distance) and 0 <= ly < len(self.distance):
+            return ly, lx
+        return None
+
+    def distance_to(self, position: vector) -> int:
+        """Steps from position to the origin, or None if it is not reached"""
+        local = self._local(position)
+        if local is None or self.distance[local] == UNREACHED:
+            return None
+        return int(self.distance[local])
+
+    def step(self, position: vector) -> vector:
+        """The move from position that brings it one step nearer the origin"""
+        if self.distance_to(position) is None:
+            return vector([0, 0, 0])
+        dx, dy = self.steps[self._local(position)].tolist()
+        return vector([dx, dy, 0])
@@ -0,0 +1,91 @@
+#! /usr/bin/env python3
+
+from functools import lru_cache
+
+from numpy import arange, array, hypot, ix_, ndarray, zeros
+
+from vector import vector
+
+# Transforms from octant-local (dx, dy) to map (x, y) offsets
+OCTANTS = ((1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+           (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1))
+
+
+@lru_cache()
+def distances(radius: int) -> ndarray:
+    offsets = arange(-radius, radius + 1)
+    return hypot(*ix_(offsets, offsets))
+
+
+def shadowcast(transparent: ndarray, radius: int) -> ndarray:
+    """Recursive shadowcasting over a (2r+1, 2r+1) transparency grid centred on the viewer"""
+    lit = zeros(transparent.shape, dtype=bool)
+    lit[radius, radius] = True
+
+    def cast(row: int, start: float, end: float, xx: int, xy: int, yx: int, yy: int):
+        if start < end:
+            return
+        new_start = start
+        for j in range(row, radius + 1):
+            dx, dy = -j - 1, -j
+            blocked = False
+            while dx <= 0:
+                dx += 1
+                x = radius + dx * xx + dy * xy
+                y = radius + dx * yx + dy * yy
+                l_slope, r_slope = (dx - 0.5) / (dy + 0.5), (dx + 0.5) / (dy - 0.5)
+                if start < r_slope:
+                    continue
+                elif end > l_slope:
+                    break
+                lit[y, x] = True
+                if blocked:
+                    if not transparent[y, x]:
+                        new_start = r_slope
+                    else:
+                        blocked = False
+                        start = new_start
+                elif not transparent[y, x] and j < radius:
+                    blocked = True
+                    cast(j + 1, start, l_slope, xx, xy, yx, yy)
+                    new_start = r_slope
+            if blocked:
+                break
+
+    for octant in OCTANTS:
+        cast(1, 1.0, 0.0, *octant)
+    return lit
+
+
+class FieldOfView:
+
+    def __init__(self, game_map, origin: vector, radius: int):
+        self.origin = ox, oy, oz = tuple(origin)
+        self.radius = radius
+        self.version = game_map.version
+        y_max, x_max, _ = game_map.transparent.shape
+        ys = arange(oy - radius, oy + radius + 1) % y_max
+        xs = arange(ox - radius, ox + radius + 1) % x_max
+        self.lit = shadowcast(game_map.transparent[ix_(ys, xs)][:, :, oz], radius)
+        self.distance = distances(radius) * self.lit
+
+    def visible(self, position: vector):
+        x, y, _ = position
+        ox, oy, _ = self.origin
+        lx, ly = x - ox + self.radius, y - oy + self.radius
+        if not (0 <= lx < len(self.lit) and 0 <= ly < len(self.lit)):
+            return False
+        if not self.lit[ly, lx]:
+            return False
+        return self.distance[ly, lx] or True
+
+    def window(self, xs: list, ys: list) -> ndarray:
+        ox, oy, _ = self.origin
+        size = len(self.lit)
+        lxs = array(xs) - ox + self.radius
+        lys = array(ys) - oy + self.radius
+        x_ok = (lxs >= 0) & (lxs < size)
+        y_ok = (lys >= 0) & (lys < size)
+        mask = zeros((len(ys), len(xs)), dtype=bool)
+        mask[ix_(y_ok, x_ok)] = self.lit[ix_(lys[y_ok], lxs[x_ok])]
+        return mask
@@ -0,0 +1,71 @@
+#! /usr/bin/env python3
+
+from math import cos, radians, sin, tan
+
+from numpy import array, cross, eye, float64, ndarray, stack
+from numpy.linalg import norm
+
+# The matrices below match the fixed-function GL calls of the same names, as
+# row-major numpy arrays acting on column vectors, so that culling sees
+# exactly the transform that is drawn with.
+
+
+def perspective(fov: float, aspect: float, near: float, far: float) -> ndarray:
+    """gluPerspective"""
+    f = 1 / tan(radians(fov) / 2)
+    return array([[f / aspect, 0, 0, 0],
+                  [0, f, 0, 0],
+                  [0, 0, (far + near) / (near - far), 2 * far * near / (near - far)],
+                  [0, 0, -1, 0]])
+
+
+def look_at(eye_: tuple, centre: tuple, up: tuple) -> ndarray:
+    """gluLookAt"""
+    eye_ = array(eye_, dtype=float64)
+    forward = array(centre, dtype=float64) - eye_
+    forward /= norm(forward)
+    side = cross(forward, up)
+    side /= norm(side)
+    up = cross(side, forward)
+    matrix = eye(4)
+    matrix[0, :3], matrix[1, :3], matrix[2, :3] = side, up, -forward
+    return matrix @ translate(-eye_)
+
+
+def rotate(angle: float, axis: tuple) -> ndarray:
+    """glRotatef"""
+    x, y, z = array(axis, dtype=float64) / norm(axis)
+    c, s = cos(radians(angle)), sin(radians(angle))
+    matrix = eye(4)
+    matrix[:3, :3] = [[x * x * (1 - c) + c, x * y * (1 - c) - z * s, x * z * (1 - c) + y * s],
+                      [y * x * (1 - c) + z * s, y * y * (1 - c) + c, y * z * (1 - c) - x * s],
+                      [z * x * (1 - c) - y * s, z * y * (1 - c) + x * s, z * z * (1 - c) + c]]
+    return matrix
+
+
+def translate(offset: tuple) -> ndarray:
+    """glTranslatef"""
+    matrix = eye(4)
+    matrix[:3, 3] = offset
+    return matrix
+
+
+class Frustum:
+    """The six planes bounding what a projection and modelview put on screen.
+
+    visible() tests any number of bounding spheres against all six at once, so
+    a frame is culled with a single (N, 3) by (3, 6) matrix product.
+    """
+
+    def __init__(self, projection: ndarray, modelview: ndarray):
+        clip = projection @ modelview
+        # Left, right, bottom, top, near and far, from the rows of the clip matrix
+        planes = stack([clip[3] + clip[0], clip[3] - clip[0],
+                        clip[3] + clip[1], clip[3] - clip[1],
+                        clip[3] + clip[2], clip[3] - clip[2]])
+        self.planes = planes / norm(planes[:, :3], axis=1)[:, None]
+
+    def visible(self, centres: ndarray, radius: float) -> ndarray:
+        """Mask of the (N, 3) centres whose spheres of radius reach inside the frustum"""
+        distances = centres @ self.planes[:, :3].T + self.planes[:, 3]
+        return (distances >= -radius).all(axis=1)
@@ -1,75 +1,78 @@
 #! /usr/bin/env python3
 
 from functools import wraps
-from multiprocessing import Process
-from threading import Thread
+from math import ceil
 from time import time
 
+from numpy import array, array_equal, ascontiguousarray, empty, float32, frombuffer, ndarray
 from OpenGL.GL import *
-# from OpenGL.arrays import vbo
+from OpenGL.arrays import vbo
 from OpenGL.GLU import *
 from OpenGL.GLUT import *
 from PIL import Image
 
+from atlas import Atlas
+from frustum import Frustum, look_at, perspective, rotate, translate
+from profiler import profiler
+from protocol import INSTANCE, FrameDecoder, GlObject
+from sharedframes import SharedFrames
+from terrain import BORDER, FACE, TerrainMesh
 from vector import vector
 
 
-class GlObject:
-    vertices = ((0.45, 0.45, -0.45),
-                (-0.45, 0.45, -0.45),
-                (-0.45, 0.45, 0.45),
-                (0.45, 0.45, 0.45),
-                (0.45, -0.45, 0.45),
-                (-0.45, -0.45, 0.45),
-                (-0.45, -0.45, -0.45),
-                (0.45, -0.45, -0.45))
-    corners = ((1.0, 1.0),
-               (0.0, 1.0),
-               (0.0, 0.0),
-               (1.0, 0.0))
-    surfaces = ((0, 1, 2, 3),
-                # (7, 6, 5, 4),
-                # (3, 2, 5, 4),
-                # (1, 0, 7, 6),
-                # (1, 2, 5, 6),
-                # (3, 0, 7, 4),
-                )
-
-    def __init__(self, centre: vector, texid: int):
-        self.position = vector(centre)
-        self.texture = texid
-
-    def draw(self):
-        glBindTexture(GL_TEXTURE_2D, self.texture)
-        glBegin(GL_QUADS)
-        for vertex_ids in GlObject.surfaces:
-            for tex_coord, vertex in zip(GlObject.corners, vertex_ids):
-                glTexCoord2f(*tex_coord)
-                glVertex3f(*self.vertices[vertex])
-        glEnd()
-
-    @property
-    def position(self):
-        return self.pos
-
-    @position.setter
-    def position(self, v: vector):
-        x, y, z = v
-        self.pos = vector([x, z, y])
-        self.vertices = tuple(tuple(map(sum, zip(vertex, self.pos)))
-                              for vertex in GlObject.vertices)
-
-
-@wraps
-class Memoize:
-    def __init__(self, f):
-        self.f = f
-        self.memo = {}
-
-    def __call__(self, *args, **kwargs):
-        if args not in self.memo:
-            self.memo[args] = self.f(*args, **kwargs)
-        return self.memo[args]
+class QuadBatch:
+    # Interleaved (u, v, x, y, z) float32 vertices, four per quad
+    STRIDE = 5 * 4
+    corners = array([corner for vertex_ids in GlObject.surfaces
+                     for corner, _ in zip(GlObject.corners, vertex_ids)], dtype=float32)
+    quad = array([GlObject.vertices[vertex] for vertex_ids in GlObject.surfaces
+                  for vertex in vertex_ids], dtype=float32)
+    # Of a sphere about the object's centre that holds all of it
+    radius = max(sum(c * c for c in vertex) for vertex in GlObject.vertices) ** 0.5
+
+    def __init__(self, usage=GL_STREAM_DRAW):
+        self.usage = usage
+        self.buffer = None
+        self.count = 0
+
+    def load(self, vertices: ndarray):
+        """Take prepared (M, 5) interleaved vertices, four per quad"""
+        self.count = len(vertices)
+        if self.buffer is None:
+            self.buffer = vbo.VBO(vertices.ravel(), usage=self.usage)
+        else:
+            self.buffer.set_array(vertices.ravel())
+
+    def update(self, start: int, vertices: ndarray):
+        """Overwrite vertices from start on, uploading just that range on the next bind"""
+        self.buffer[start * 5:(start + len(vertices)) * 5] = vertices.ravel()
+
+    def build(self, positions: ndarray, uvs: ndarray):
+        """Build quads centred on (N, 3) map positions with (N, 4) atlas uv rects"""
+        self.count = len(positions) * len(QuadBatch.quad)
+        if not self.count:
+            return
+        # Map (x, y, z) is GL (x, z, y)
+        positions = positions[:, (0, 2, 1)].astype(float32)
+        vertices = empty((len(positions), len(QuadBatch.quad), 5), dtype=float32)
+        origins, extents = uvs[:, None, :2], uvs[:, None, 2:] - uvs[:, None, :2]
+        vertices[:, :, :2] = origins + QuadBatch.corners * extents
+        vertices[:, :, 2:] = positions[:, None, :] + QuadBatch.quad
+        self.load(vertices.reshape(-1, 5))
+
+    def draw(self, texture: int):
+        if not self.count:
+            return
+        glBindTexture(GL_TEXTURE_2D, texture)
+        self.buffer.bind()
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glTexCoordPointer(2, GL_FLOAT, QuadBatch.STRIDE, self.buffer)
+        glVertexPointer(3, GL_FLOAT, QuadBatch.STRIDE, self.buffer + 8)
+        glDrawArrays(GL_QUADS, 0, self.count)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        self.buffer.unbind()
 
 
 def renderer(func):
@@ -79,62 +82,43 @@ def renderer(func):
         glutSetWindowTitle("FPS: %02d" % (1 / dtime,))
         # glUseProgram(SHADER)
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        glLoadIdentity()
-        gluLookAt(*self.camera_offset,
-                  *(0.0, 0.0, 0.0),
-                  *(0.0, 1.0, 0.0))
-        glRotatef(self.camera_rot[1], -1.0, 0.0, 0.0)
-        glRotatef(self.camera_rot[0], 0.0, 1.0, 0.0)
-        glTranslatef(*(self.camera_pos))
+        # GL wants column-major, the transpose of numpy's row-major
+        glLoadMatrixf(ascontiguousarray(self.modelview().T, dtype=float32))
         func(self, *args, **kwargs)
         glutSwapBuffers()
     return wrapper
 
 
-def multiprocess(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        process = Process(target=func, args=args, kwargs=kwargs)
-        process.start()
-        return process
-    return wrapper
-
-
-def thread(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        process = Thread(target=func, args=args, kwargs=kwargs)
-        process.start()
-        return process
-    return wrapper
-
-
-def timeit(method):
-    from time import time
-
-    def timed(*args, **kw):
-        ts = time()
-        result = method(*args, **kw)
-        te = time()
-        print(te - ts)
-        return result
-    return timed
-
-
 class GlManager:
 
-    def __init__(self, pipe, width: int, height: int, fov=45.0, depth=50.0):
+    def __init__(self, pipe, width: int, height: int, fov=45.0, depth=50.0,
+                 font: str = None, frames: SharedFrames = None):
         self.pipe = pipe
+        self.font = font
+        self.frames = frames
+        self.sequence = 0
         self.fps = time()
         self.camera_pos = vector([0.0, 0.0, 0.0])
         self.camera_offset = vector([0, 10.0, -10.0])
         self.camera_rot = [180.0, 0.0]
         self.textures = {}
+        self.atlas = None
+        self.atlas_texture = None
         self.keypresses = {}
-        self.renders = []
+        self.decoder = FrameDecoder()
+        self.batch = QuadBatch()
+        # Explored terrain, drawn from one static batch and texture per glyph
+        self.terrain = TerrainMesh()
+        self.terrain_batches = {}
+        self.terrain_textures = {}
+        # The latest frame, and the view it was last culled for
+        self.positions = self.uvs = None
+        self.culled = None
         # OpenGL stuff
         self.width, self.height = width, height
         self.fov, self.depth = fov, depth
+        self.near = 0.1
+        self.projection = perspective(fov, width / height, self.near, depth)
 
     def gl_init(self):
         glutInit()
@@ -156,8 +140,7 @@ class GlManager:
         glShadeModel(GL_SMOOTH)
         glMatrixMode(GL_PROJECTION)
         glLoadIdentity()
-        gluPerspective(self.fov, float(self.width) / float(self.height),
-                       0.1, self.depth)
+        glLoadMatrixf(ascontiguousarray(self.projection.T, dtype=float32))
         glMatrixMode(GL_MODELVIEW)
 
     def key_down(self, char, x, y):
@@ -186,49 +169,132 @@ class GlManager:
             glutTimerFunc(1000 // 60, camera, 0)
         return camera
 
+    def modelview(self) -> ndarray:
+        return (look_at(self.camera_offset, (0.0, 0.0, 0.0), (0.0, 1.0, 0.0))
+                @ rotate(self.camera_rot[1], (-1.0, 0.0, 0.0))
+                @ rotate(self.camera_rot[0], (0.0, 1.0, 0.0))
+                @ translate(self.camera_pos))
+
+    def cull(self):
+        """Rebuild the batch from what of the latest frame the camera can see,
+        if the frame or the camera has changed since it was last built"""
+        modelview = self.modelview()
+        if self.positions is None or (self.culled is not None
+                                      and array_equal(modelview, self.culled)):
+            return
+        self.culled = modelview
+        # Map (x, y, z) is GL (x, z, y)
+        centres = self.positions[:, (0, 2, 1)]
+        visible = Frustum(self.projection, modelview).visible(centres, QuadBatch.radius)
+        self.batch.build(self.positions[visible], self.uvs[visible])
+
+    def build_terrain(self):
+        """Upload what the newly explored terrain changed, and no more"""
+        for glyph, ranges in self.terrain.remesh().items():
+            vertices = self.terrain.arrays[glyph]
+            batch = self.terrain_batches.get(glyph)
+            if batch is None:
+                batch = self.terrain_batches[glyph] = QuadBatch(GL_STATIC_DRAW)
+            if ranges is None or batch.buffer is None:
+                batch.load(vertices)
+            else:
+                for start, end in ranges:
+                    batch.update(start, vertices[start:end])
+            batch.count = self.terrain.used[glyph]
+
     @renderer
     def render(self):
-        for obj in self.renders:
-            if obj is not None:
-                obj.draw()
+        for glyph, batch in self.terrain_batches.items():
+            batch.draw(self.terrain_texture(glyph))
+        self.batch.draw(self.atlas_texture)
         # self.hud.render()
 
     def update(self):
-        if self.pipe.poll():
+        while self.pipe.poll():
             req = self.pipe.recv()
-            if req == 'keypresses':
-                self.pipe.send(self.keypresses)
-            elif req == 'render':
-                self.renders, self.state, (x, y, z) = self.pipe.recv()
-                self.camera_pos = vector([-x, z, -y])
-                if self.state == 'quit':
-                    glutLeaveMainLoop()
-            elif req == 'textures':
-                for i in range(32, 128):
-                    self.texture('font/%03d.png' % i)
-                self.pipe.send(self.textures)
-        self.render()
-
-    @Memoize
-    def texture(self, path: str):
-        picture = Image.open(path)
-        width, height = picture.size
-        pBits = picture.tobytes("raw", "RGBX", 0, -1)
+            with profiler.span('gl.' + req):
+                if req == 'keypresses':
+                    self.pipe.send(self.keypresses)
+                elif req == 'render':
+                    instances = self.decoder.decode(self.pipe.recv_bytes())
+                    self.show(instances['position'], instances['glyph'],
+                              self.decoder.state, self.decoder.camera)
+                elif req == 'textures':
+                    if self.atlas is None:
+                        self.load_atlas()
+                    self.pipe.send(self.textures)
+                elif req == 'level':
+                    self.terrain.clear()
+                    for batch in self.terrain_batches.values():
+                        batch.count = 0
+                elif req == 'terrain':
+                    records = frombuffer(self.pipe.recv_bytes(), dtype=INSTANCE)
+                    self.terrain.add(records['position'], records['glyph'])
+                    self.build_terrain()
+        if self.frames is not None and self.atlas is not None:
+            with profiler.span('gl.read'):
+                frame = self.frames.read(self.sequence)
+            if frame is not None:
+                self.sequence, positions, glyphs, _, state, camera = frame
+                self.show(positions, glyphs, state, camera)
+        if self.atlas is not None:
+            with profiler.span('gl.cull'):
+                self.cull()
+        with profiler.span('gl.render'):
+            self.render()
+
+    def show(self, positions: ndarray, glyphs: ndarray, state: str, camera: vector):
+        self.positions, self.uvs = positions, self.atlas.uvs[glyphs]
+        self.culled = None
+        self.state = state
+        x, y, z = camera
+        self.camera_pos = vector([-x, z, -y])
+        if self.state == 'quit':
+            glutLeaveMainLoop()
+
+    def load_atlas(self):
+        self.atlas = Atlas.cached(font_file=self.font)
+        width, height = self.atlas.size
         glEnable(GL_TEXTURE_2D)
-        texid = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, texid)
+        self.atlas_texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.atlas_texture)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
         glTexImage2D(GL_TEXTURE_2D, 0, 3, width, height, 0, GL_RGBA,
-                     GL_UNSIGNED_BYTE, pBits)
-        self.textures[path] = texid
-        return texid
+                     GL_UNSIGNED_BYTE, self.atlas.pixels)
+        self.textures = self.atlas.glyphs
+
+    def terrain_texture(self, glyph: int) -> int:
+        """A repeating texture of one cell of a terrain glyph, for the mesh's merged quads"""
+        if glyph not in self.terrain_textures:
+            width, height = self.atlas.size
+            u0, v0, u1, v1 = self.atlas.uvs[glyph].tolist()
+            # Pixel rows run bottom first, like v
+            face = Image.fromarray(self.atlas.pixels[round(v0 * height):round(v1 * height),
+                                                     round(u0 * width):round(u1 * width)][::-1])
+            # The glyph fills the face as on an object's quad, and the border is the gap
+            size = Atlas.power_of_two(ceil(max(face.size) / (2 * FACE)))
+            border = round(size * BORDER)
+            cell = Image.new('RGBA', (size, size), (0, 0, 0, 255))
+            cell.paste(face.resize((size - 2 * border, size - 2 * border)), (border, border))
+            texture = glGenTextures(1)
+            glBindTexture(GL_TEXTURE_2D, texture)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+            glTexImage2D(GL_TEXTURE_2D, 0, 3, size, size, 0, GL_RGBA, GL_UNSIGNED_BYTE,
+                         cell.tobytes("raw", "RGBX", 0, -1))
+            self.terrain_textures[glyph] = texture
+        return self.terrain_textures[glyph]
 
     def quit(self):
         glutDestroyWindow(glutGetWindow())
+        # A multiprocessing child exits without running atexit handlers
+        profiler.write()
         sys.exit()
 
-    @multiprocess
     def loop(self):
+        """Run the window until the game quits; call this in the renderer process"""
+        profiler.rename('gl')
         self.gl_init()
         # glutFullScreen()
         glutMainLoop()
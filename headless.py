@@ -0,0 +1,111 @@
+#! /usr/bin/env python3
+
+from collections import deque
+from itertools import repeat
+from random import Random
+from statistics import mean, quantiles
+from time import perf_counter
+
+from maps import MAPS
+from protocol import placeholders
+from rogue import GameManager
+from session import read_session
+
+
+class HeadlessEndpoint:
+    """Stands in for the GL end of the game pipe, without a display.
+
+    Answers 'textures' with atlas glyph indices, 'keypresses' from a script of
+    keypress dicts (no keys once it runs out) and counts then discards renders
+    and terrain.
+    """
+
+    def __init__(self, script=()):
+        self.script = iter(script)
+        self.textures = placeholders()
+        self.replies = deque()
+        self.request = None
+        self.frames = 0
+        self.frame_bytes = 0
+        self.terrain_bytes = 0
+
+    @staticmethod
+    def wander(seed: int = 0, hold: int = 4):
+        """An endless script that holds a random direction key for a few ticks at a time"""
+        rng = Random(seed)
+        while True:
+            yield from repeat({rng.choice('wasd'): 1}, hold)
+
+    def poll(self) -> bool:
+        return bool(self.replies)
+
+    def send(self, req):
+        self.request = req
+        if req == 'textures':
+            self.replies.append(self.textures)
+        elif req == 'keypresses':
+            self.replies.append(next(self.script, {}))
+
+    def send_bytes(self, frame: bytes):
+        if self.request == 'terrain':
+            self.terrain_bytes += len(frame)
+            return
+        self.frames += 1
+        self.frame_bytes += len(frame)
+
+    def recv(self):
+        return self.replies.popleft()
+
+
+def run(ticks: int, script=None, seed: int = 0, tick_rate: float = None, **options) -> dict:
+    """Step a GameManager for a number of ticks, without a GL process.
+
+    The ticks run as fast as possible, or paced at tick_rate as GameManager.loop
+    paces them, in which case the late and skipped counts show whether the game
+    keeps up. Any other keyword arguments are passed on to the GameManager.
+    """
+    endpoint = HeadlessEndpoint(HeadlessEndpoint.wander(seed) if script is None else script)
+    game = GameManager(endpoint, tick_rate=tick_rate, seed=seed, **options)
+    steps = 0
+    t0 = perf_counter()
+    while steps < ticks and game.state == 'game':
+        for _ in range(game.scheduler.wait()):
+            game.step()
+            steps += 1
+            if steps == ticks or game.state != 'game':
+                break
+        game.send_frame()
+    elapsed = perf_counter() - t0
+    game.close()
+    stats = game.scheduler.stats
+    return {'ticks': steps, 'seconds': elapsed, 'tick_ms': 1000 * elapsed / max(steps, 1),
+            'frames': endpoint.frames, 'frame_bytes': endpoint.frame_bytes,
+            'terrain_bytes': endpoint.terrain_bytes, 'late': stats['late'],
+            'skipped': stats['skipped'], 'state': game.state}
+
+
+def replay(path: str) -> dict:
+    """Step a recorded session tick by tick, as GameManager.loop does without a tick
+    rate, and report the distribution of tick times.
+
+    Levels are generated in the replaying process rather than prefetched, so that no
+    worker competes with the ticks being timed; the levels are the same either way.
+    """
+    header, ticks = read_session(path)
+    endpoint = HeadlessEndpoint(ticks)
+    game = GameManager(endpoint, tick_rate=None, seed=header['seed'],
+                       map_type=MAPS[header['map_type']], map_size=header['map_size'],
+                       level_dir=header.get('level_dir'), prefetch=False)
+    samples = []
+    for _ in ticks:
+        if game.state != 'game':
+            break
+        t0 = perf_counter()
+        game.step()
+        game.send_frame()
+        samples.append((perf_counter() - t0) * 1000)
+    game.close()
+    cuts = quantiles(samples, n=100) if len(samples) > 1 else samples * 99
+    return {'ticks': len(samples), 'seconds': sum(samples) / 1000, 'mean_ms': mean(samples),
+            'p50_ms': cuts[49], 'p90_ms': cuts[89], 'p99_ms': cuts[98], 'max_ms': max(samples),
+            'state': game.state, 'player': list(game.player.position)}
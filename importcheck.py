@@ -0,0 +1,71 @@
+#! /usr/bin/env python3
+"""Checks that the game side imports lean: without any GL, windowing, image or
+pygame module, and within a time budget. Imports are timed with -X importtime
+in a fresh interpreter:
+
+    python3 importcheck.py
+    python3 importcheck.py --budget-ms 200
+"""
+
+from argparse import ArgumentParser
+import os
+import subprocess
+import sys
+
+# Everything the game, headless and prefetch processes import
+MODULES = ('rogue', 'headless', 'prefetch', 'bench')
+# Only the renderer process may import these
+FORBIDDEN = ('OpenGL', 'PIL', 'pygame', 'glwrap', 'atlas', 'hud')
+BUDGET_MS = 300
+
+
+def import_times(modules: tuple) -> dict:
+    """Cumulative import time in microseconds of every module that importing
+    modules loads, and the total under 'total'"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                             'import ' + ', '.join(modules)],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True)
+    times = {'total': 0}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        times[name.strip()] = int(cumulative)
+        # Nested imports are indented beyond the single space of a top-level one
+        if name[1:] == name.strip():
+            times['total'] += int(cumulative)
+    return times
+
+
+def check(times: dict, budget_ms: float = BUDGET_MS) -> list:
+    """Problems with the import times of some modules, if any"""
+    packages = {name.split('.')[0] for name in times}
+    problems = ['imports %s' % name for name in FORBIDDEN if name in packages]
+    if times['total'] > budget_ms * 1000:
+        slowest = sorted((name for name in times if name != 'total'),
+                         key=times.get, reverse=True)[:5]
+        problems.append('imports took %.0f ms, over the %.0f ms budget (slowest: %s)'
+                        % (times['total'] / 1000, budget_ms,
+                           ', '.join('%s %.0f ms' % (name, times[name] / 1000)
+                                     for name in slowest)))
+    return problems
+
+
+def main(argv: list = None):
+    parser = ArgumentParser(description='Check the import cost of the game side')
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_MS)
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    args = parser.parse_args(argv)
+    times = import_times(tuple(args.modules))
+    problems = check(times, args.budget_ms)
+    for problem in problems:
+        print('%s: %s' % (', '.join(args.modules), problem))
+    if problems:
+        sys.exit(1)
+    print('%s: %.0f ms, within %.0f ms' % (', '.join(args.modules), times['total'] / 1000,
+                                           args.budget_ms))
+
+
+if __name__ == '__main__':
+    main()
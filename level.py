@@ -0,0 +1,56 @@
+#! /usr/bin/env python3
+
+import json
+import os
+
+from numpy import dtype, load, ndarray, save
+
+ENTITY = dtype([('type', 'U16'), ('position', '<i4', 3), ('hp', '<i4')])
+
+
+class Level:
+    """A level on disk: one .npy file per map array, an entity table and a little JSON.
+
+    The arrays are loaded memory-mapped copy-on-write, so a level of any size
+    opens in milliseconds, only the pages that are read get faulted in and
+    nothing played is written back to the files.
+    """
+    ARRAYS = ('kinds', 'solid', 'transparent', 'explored')
+    FORMAT = 1
+
+    def __init__(self, arrays: dict, entities: ndarray, meta: dict, path: str = None):
+        self.arrays = arrays
+        self.entities = entities
+        self.meta = meta
+        # Where the level was loaded from, if it was
+        self.path = path
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        for name, values in self.arrays.items():
+            Level.replace(os.path.join(path, name + '.npy'), values)
+        Level.replace(os.path.join(path, 'entities.npy'), self.entities)
+        with open(os.path.join(path, 'level.json'), 'w') as f:
+            json.dump(self.meta, f)
+
+    @staticmethod
+    def replace(path: str, values: ndarray):
+        # Written to a temporary file first, as values may be mapped from the file at path
+        partial = '%s.%d' % (path, os.getpid())
+        with open(partial, 'wb') as f:
+            save(f, values)
+        os.replace(partial, path)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, 'level.json'))
+
+    @staticmethod
+    def load(path: str) -> 'Level':
+        with open(os.path.join(path, 'level.json')) as f:
+            meta = json.load(f)
+        if meta.get('format') != Level.FORMAT:
+            raise ValueError('Unsupported level format in %s' % path)
+        arrays = {name: load(os.path.join(path, name + '.npy'), mmap_mode='c')
+                  for name in Level.ARRAYS}
+        return Level(arrays, load(os.path.join(path, 'entities.npy')), meta, path)
@@ -1,25 +1,34 @@
 #! /usr/bin/env python3
 
-from random import shuffle, choice, randrange
-import resource
-import sys
+from collections import OrderedDict
+from itertools import product
+import os
+import random
+from random import Random
+from tempfile import TemporaryDirectory
 from typing import *
 
-import pygame
-from numpy import array, concatenate, set_printoptions, inf
+from numpy import (arange, argwhere, array, concatenate, full, ix_, ndarray, ndindex, ones,
+                   stack, uint8, zeros)
+from numpy.random import default_rng
 
 from constants import *
-from objects import UpdateRenderable
-from tiles import Air, Wall, Dirt, Bonfire
-from fighters import Goblin, Gorgon, Wizard
+from flowfield import FlowField
+from fov import FieldOfView
+from level import ENTITY, Level
+from maze import kruskal_maze
+from objects import Object, UpdateRenderable
+from particles import Particles
+from profiler import profiler
+from protocol import INSTANCE, instances
+from registry import Registry
+from scheduler import TimingWheel
+from tiles import (Tile, Air, Wall, Dirt, Bonfire, TILES, SPRITES, SOLID,
+                   TRANSPARENT, RENDERED, STATIC)
+from fighters import Goblin, Gorgon, Troll, Wizard
 from pickups import Ladder, Sword
 from vector import vector
 
-resource.setrlimit(resource.RLIMIT_STACK, (2**29, -1))
-sys.setrecursionlimit(10**6)
-set_printoptions(threshold=inf)
-pygame.init()
-
 
 class Room:
 
@@ -51,153 +60,370 @@ class Room:
 
 
 class Map(metaclass=UpdateRenderable):
+    LOS_CACHE_SIZE = 2**16
+    persistent = True
 
-    def __init__(self, game_ref, size: vector, from_map: array = None):
+    def __init__(self, game_ref, size: vector, from_map: ndarray | Level = None,
+                 seed: int = None):
+        """A map of kinds from_map, or of a saved Level's memory-mapped arrays, or else
+        one newly generated from seed"""
         self.game = game_ref
         self.size = size
+        self.random = random if seed is None else Random(seed)
         self.player_start = None
-        self.effects = []
-        if from_map is not None:
-            self.map = from_map
+        self.entities = Registry()
+        self.actors = TimingWheel()
+        self.particles = Particles(seed=seed)
+        self.tiles = {}
+        self.version = 0
+        self._fov = None
+        self._flow = None
+        self._los = {}
+        self._los_version = 0
+        self.level = None
+        self.revealed = []
+        if isinstance(from_map, Level):
+            self.level = from_map
+            for name in Level.ARRAYS:
+                setattr(self, name, from_map.arrays[name])
+            self.player_start = vector(from_map.meta['player_start'])
+            self.reveal_explored(from_map.meta.get('explored', [0, None, 0, None]))
         else:
-            self.gen_map()
+            if from_map is not None:
+                self.kinds = from_map
+            else:
+                self.gen_map()
+            self.solid = SOLID[self.kinds]
+            self.transparent = TRANSPARENT[self.kinds]
+            self.explored = zeros(self.kinds.shape, dtype=bool)
 
     def __getitem__(self, slice_):
+        if isinstance(slice_, vector):
+            for entity in self.entities.at(slice_):
+                if entity.solid:
+                    return entity
+            return self.tile(slice_)
         if len(slice_) == 3:
             xs, ys, zs = slice_
         else:
             xs, ys = slice_
             zs = slice(None, None)
-        ret_sl = not isinstance(slice_, vector)
-        if ret_sl and None not in [xs.start, xs.stop] and xs.start < 0 <= xs.stop:
-            left = self[slice(xs.start, None), ys, zs]
-            right = self[slice(None, xs.stop), ys, zs]
-            return concatenate((left, right), axis=1)
-        elif ret_sl and None not in [ys.start, ys.stop] and ys.start < 0 <= ys.stop:
-            top = self[xs, slice(ys.start, None), zs]
-            botm = self[xs, slice(None, ys.stop), zs]
-            return concatenate((top, botm), axis=0)
-        return self.map[ys, xs, zs]
+        x_max, y_max, z_max = self.size
+        return MapSlice(self.game, self,
+                        Map._range(xs, x_max), Map._range(ys, y_max), Map._range(zs, z_max))
 
     def __setitem__(self, slice_, value):
+        if isinstance(slice_, vector):
+            if isinstance(value, Tile):
+                self.tiles[tuple(slice_)] = value
+                self._set_kinds(self.cell(slice_), value.kind)
+            else:
+                self.add(value, slice_)
+            return
         if len(slice_) == 3:
             xs, ys, zs = slice_
         else:
             xs, ys = slice_
             zs = slice(None, None)
-        self.map[ys, xs, zs] = value
+        self.tiles.clear()
+        self._set_kinds((ys, xs, zs), value)
 
     def __repr__(self):
-        return '\n'.join([''.join([repr(tile[1]) if not isinstance(tile[1], Air)
-                                   else repr(tile[0]) for tile in row])
-                          for row in self.map])
+        sprites = SPRITES[self.kinds].tolist()
+        # Solid entities are drawn last, over anything sharing their cell
+        for entity, position in sorted(self.entities.items(), key=lambda item: item[0].solid):
+            y, x, z = self.cell(position)
+            sprites[y][x][z] = entity.sprite
+        return '\n'.join([''.join([next((s for s in reversed(cell) if s != ' '), ' ')
+                                   for cell in row])
+                          for row in sprites])
+
+    @staticmethod
+    def _range(sl: slice, length: int) -> ndarray:
+        start = 0 if sl.start is None else sl.start
+        stop = length if sl.stop is None else sl.stop
+        return arange(start, stop)
+
+    def _set_kinds(self, index: tuple, kinds):
+        self.kinds[index] = kinds
+        self.solid[index] = SOLID[self.kinds[index]]
+        transparent = TRANSPARENT[self.kinds[index]]
+        if (self.transparent[index] != transparent).any():
+            self.version += 1
+        self.transparent[index] = transparent
+
+    def add(self, entity, position: vector = None):
+        """Register an entity and, if it is new here, schedule its first update"""
+        if entity not in self.entities and entity.period:
+            self.actors.schedule(entity, entity.period)
+        self.entities.add(entity, position)
+
+    def remove(self, entity):
+        self.entities.discard(entity)
+        self.actors.cancel(entity)
+
+    def cell(self, position: vector) -> tuple:
+        x, y, z = position
+        y_max, x_max, _ = self.kinds.shape
+        return y % y_max, x % x_max, z
+
+    def tile(self, position: vector) -> Tile:
+        key = tuple(position)
+        if key not in self.tiles:
+            Type = TILES[self.kinds[self.cell(position)]]
+            self.tiles[key] = Type(self.game, vector(key))
+        return self.tiles[key]
+
+    @property
+    def fov(self) -> FieldOfView:
+        origin = tuple(self.game.player.position)
+        fov = self._fov
+        if fov is None or fov.origin != origin or fov.version != self.version:
+            self._fov = FieldOfView(self, origin, FOV_RADIUS)
+        return self._fov
+
+    @property
+    def flow(self) -> FlowField:
+        origin = tuple(self.game.player.position)
+        flow = self._flow
+        if flow is None or flow.origin != origin or flow.version != self.version:
+            self._flow = FlowField(self, origin, FLOW_RADIUS)
+        return self._flow
+
+    def line_of_sight(self, start: vector, end: vector) -> bool:
+        if self._los_version != self.version or len(self._los) > Map.LOS_CACHE_SIZE:
+            self._los.clear()
+            self._los_version = self.version
+        key = (tuple(start), tuple(end))
+        if key not in self._los:
+            x1, y1, z1 = start
+            x2, y2, z2 = end
+            y_max, x_max, _ = self.kinds.shape
+            offsets = Object.ray(x2 - x1, y2 - y1)[1:-1]
+            xs = (offsets[:, 0] + x1) % x_max
+            ys = (offsets[:, 1] + y1) % y_max
+            self._los[key] = bool(self.transparent[ys, xs, z1].all())
+        return self._los[key]
 
     def gen_map(self):
         raise NotImplementedError
 
+    @staticmethod
+    def entity_table(entities: list) -> ndarray:
+        """The lasting ones of some entities, not the player or effects, as ENTITY records"""
+        return array([(type(entity).__name__, entity.position, getattr(entity, 'hp', 0))
+                      for entity in entities if type(entity).__name__ in ENTITIES],
+                     dtype=ENTITY)
+
+    def spawn_entities(self, table: ndarray):
+        """Make and add the entities of ENTITY records"""
+        for name, position, hp in table.tolist():
+            entity = ENTITIES[name](self.game, vector(position))
+            if hasattr(entity, 'hp'):
+                entity.hp = hp
+            self.add(entity)
+
+    def meta(self) -> dict:
+        return {'format': Level.FORMAT, 'type': type(self).__name__,
+                'size': list(self.size), 'player_start': list(self.player_start),
+                'explored': self.explored_bounds()}
+
+    def explored_bounds(self) -> list | None:
+        """The [y0, y1, x0, x1] array bounds of the explored cells, or None if there are none"""
+        ys = self.explored.any(axis=(1, 2)).nonzero()[0]
+        if not len(ys):
+            return None
+        xs = self.explored.any(axis=(0, 2)).nonzero()[0]
+        return [int(ys[0]), int(ys[-1]) + 1, int(xs[0]), int(xs[-1]) + 1]
+
+    def reveal_explored(self, bounds: list | None):
+        """Queue the explored static terrain within array bounds for the terrain mesh.
+
+        Only the pages of a loaded level inside the bounds are read, so a level of
+        which little has been explored still opens without touching most of it.
+        """
+        if bounds is None:
+            return
+        y0, y1, x0, x1 = bounds
+        kinds = self.kinds[y0:y1, x0:x1]
+        cells = argwhere(self.explored[y0:y1, x0:x1] & STATIC[kinds])
+        if len(cells):
+            kinds = kinds[tuple(cells.T)]
+            cells[:, :2] += (y0, x0)
+            self.reveal(cells[:, (1, 0, 2)], kinds)
+
+    def save(self, path: str):
+        """Write the map arrays and its lasting entities, not the player, as a Level"""
+        entities = Map.entity_table([entity for entity, _ in self.entities.items()])
+        Level({name: getattr(self, name) for name in Level.ARRAYS}, entities,
+              self.meta()).save(path)
+
+    def restore(self):
+        """Bring back the entities of the level this map was loaded from"""
+        self.spawn_entities(self.level.entities)
+
+    def reveal(self, positions: ndarray, kinds: ndarray):
+        """Queue newly explored static terrain at (N, 3) positions for the terrain mesh"""
+        glyphs = array([self.game.textures['font/%03d.png' % ord(sprite)].index
+                        for sprite in SPRITES])
+        records = zeros(len(positions), dtype=INSTANCE)
+        records['position'] = positions
+        records['glyph'] = glyphs[kinds]
+        records['flags'] = TERRAIN_FLAG
+        self.revealed.append(records)
+
+    def terrain(self) -> ndarray:
+        """Records of the static terrain revealed since the last call"""
+        revealed, self.revealed = self.revealed, []
+        return concatenate(revealed) if revealed else zeros(0, dtype=INSTANCE)
+
     @property
     def renders(self) -> list:
-        effect_objs = [effect.render for effect in self.effects]
-        tile_objs = self.mapslice.renders
-        return effect_objs + tile_objs
+        return self.mapslice.renders
+
+    @property
+    def instances(self) -> ndarray:
+        """Render records for the viewport, particles included"""
+        particles = self.particles.instances(*self.mapslice.bounds)
+        if not len(particles):
+            return instances(self.renders)
+        records = concatenate((instances(self.renders), particles))
+        records.sort(order='id')
+        return records
+
+    def view(self):
+        """Slice out the viewport around the player, which renders are drawn from"""
+        x0, y0, _ = self.game.player.position - vector([DISP_WIDTH, DISP_HEIGHT, 0]) // 2
+        self.mapslice = self[x0:x0 + DISP_WIDTH, y0:y0 + DISP_HEIGHT, :]
 
     def update(self):
-        xc, yc, _ = position = self.game.player.position
-        x0, y0, _ = position - vector([DISP_WIDTH, DISP_HEIGHT, 0]) // 2
-        mslice = self[x0:x0 + DISP_WIDTH, y0:y0 + DISP_HEIGHT, :]
-        self.mapslice = MapSlice(self.game, mslice)
-        self.mapslice.update()
-        for effect in self.effects:
-            effect.update()
+        with profiler.span('view'):
+            self.view()
+        with profiler.span('particles'):
+            self.particles.update()
+        with profiler.span('actors'):
+            x0, y0, x1, y1 = self.mapslice.bounds
+            for actor in self.actors.advance():
+                if actor.period:
+                    self.actors.schedule(actor, actor.period)
+                # Anything outside the viewport waits, as it always has
+                x, y, _ = actor.position
+                if not (x0 <= x <= x1 and y0 <= y <= y1):
+                    continue
+                if profiler.detail:
+                    with profiler.span(type(actor).__name__ + '.update'):
+                        actor.update()
+                else:
+                    actor.update()
+        with profiler.span('explore'):
+            self.mapslice.update()
 
 
 class MapSlice(Map):
+    """A window onto a parent map, made afresh by every view().
 
-    def __init__(self, game_ref, map_slice: array):
-        size = vector([len(map_slice[0]), len(map_slice), len(map_slice[0, 0])])
-        super().__init__(game_ref, size, from_map=map_slice)
+    It copies only the window's kinds, and borrows the parent's registry,
+    scheduler and particle pool instead of building its own.
+    """
+
+    def __init__(self, game_ref, parent: Map, xs: ndarray, ys: ndarray, zs: ndarray):
+        self.game = game_ref
+        self.parent = parent
+        self.xs, self.ys, self.zs = xs.tolist(), ys.tolist(), zs.tolist()
+        y_max, x_max, _ = parent.kinds.shape
+        self.index = ix_(ys % y_max, xs % x_max, zs)
+        self.size = vector([len(xs), len(ys), len(zs)])
+        self.kinds = parent.kinds[self.index]
+        self.random, self.tiles = parent.random, parent.tiles
+        self.entities, self.actors = parent.entities, parent.actors
+        self.particles = parent.particles
+
+    @property
+    def solid(self) -> ndarray:
+        return self.parent.solid[self.index]
+
+    @property
+    def transparent(self) -> ndarray:
+        return self.parent.transparent[self.index]
+
+    @property
+    def explored(self) -> ndarray:
+        return self.parent.explored[self.index]
+
+    def positions(self, mask: ndarray = None):
+        for y, x, z in argwhere(mask) if mask is not None else ndindex(self.kinds.shape):
+            yield self.xs[x], self.ys[y], self.zs[z]
+
+    @property
+    def bounds(self) -> tuple:
+        return self.xs[0], self.ys[0], self.xs[-1], self.ys[-1]
+
+    @property
+    def contents(self) -> list:
+        return self.parent.entities.region(*self.bounds)
 
     @property
     def renders(self) -> list:
-        tile_vecs = []
-        for row in self.map:
-            for column in row:
-                for cell in column:
-                    tile_vecs.append(cell.render)
+        entities = self.contents
+        tile_vecs = [entity.render for entity in entities]
+        covered = {tuple(entity.position) for entity in entities if entity.solid}
+        explored = self.parent.explored[self.index] & RENDERED[self.kinds] & ~STATIC[self.kinds]
+        for position in self.positions(explored):
+            if position not in covered:
+                tile_vecs.append(self.parent.tile(vector(position)).render)
         return tile_vecs
 
     def update(self):
-        for row in self.map.copy():
-            for column in row:
-                for cell in column:
-                    cell.update()
+        visible = self.parent.fov.window(self.xs, self.ys)[:, :, None]
+        explored = self.parent.explored[self.index]
+        revealed = visible & ~explored & STATIC[self.kinds]
+        if revealed.any():
+            ys, xs, zs = revealed.nonzero()
+            self.parent.reveal(stack([array(self.xs)[xs], array(self.ys)[ys],
+                                      array(self.zs)[zs]], axis=1),
+                               self.kinds[ys, xs, zs])
+        self.parent.explored[self.index] = explored | visible
 
 
 class Maze(Map):
 
     def gen_map(self):
-        def make_maze(w=20, h=20):
-            vis = [[0] * w + [1] for _ in range(h)] + [[1] * (w + 1)]
-            ver = [["# "] * w + ['#'] for _ in range(h)] + [[]]
-            hor = [["##"] * w + ['#'] for _ in range(h + 1)]
-
-            def walk(x, y):
-                vis[y][x] = 1
-                d = [(x - 1, y), (x, y + 1), (x + 1, y), (x, y - 1)]
-                shuffle(d)
-                for (xx, yy) in d:
-                    if vis[yy][xx]:
-                        continue
-                    if xx == x:
-                        hor[max(y, yy)][x] = "# "
-                    if yy == y:
-                        ver[y][max(x, xx)] = "  "
-                    walk(xx, yy)
-
-            walk(randrange(w), randrange(h))
-            mapdat = []
-            for rrow in zip(hor, ver):
-                mapdat.extend([''.join(x) for x in rrow])
-            return mapdat
-
-        mapdat = make_maze(self.size[0], self.size[1])
-        w = lambda x, y: [Wall(self.game, vector([x, y, z]))
-                          for z in range(self.size[2])]
-        d = lambda x, y: [Dirt(self.game, vector([x, y, 0]))] + \
-                         [Air(self.game, vector([x, y, z]))
-                          for z in range(1, self.size[2])]
         x_max, y_max, z_max = self.size
-        _map = [[w(x, y) if mapdat[y][x] == '#' or
-                 x + 1 == x_max or y + 1 == y_max
-                 else d(x, y)
-                 for x in range(self.size[0])] for y in range(self.size[1])]
-        self.map = array(_map, ndmin=3)
+        rng = default_rng(self.random.randrange(2**32))
+        maze = kruskal_maze((x_max - 1) // 2, (y_max - 1) // 2, rng)
+        walls = ones((y_max, x_max), dtype=bool)
+        walls[:maze.shape[0], :maze.shape[1]] = maze
+        self.kinds = full((y_max, x_max, z_max), Air.kind, dtype=uint8)
+        self.kinds[:, :, 0] = Dirt.kind
+        self.kinds[walls] = Wall.kind
         self.player_start = vector([1, 1, 1])
 
-    def populate(self):
+    def populate(self, monsters: int = 1):
         pass
 
 
 class Dungeon(Maze):
     ATTEMPTS = 40
 
-    def populate(self):
+    def populate(self, monsters: int = 1):
         self.player_start = self.rooms[0].center
         self[self.player_start] = Bonfire(self.game, self.player_start)
 
         items = [Ladder, Sword]
         for Item, room in zip(items, self.rooms[1:]):
-            pos = vector([randrange(room.x1, room.x2),
-                          randrange(room.y1, room.y2),
+            pos = vector([self.random.randrange(room.x1, room.x2),
+                          self.random.randrange(room.y1, room.y2),
                           1])
             Item(self.game, pos).spawn()
 
         for room in self.rooms[len(items) + 1:]:
-            Spawn = choice([Goblin, Wizard, Gorgon])
-            pos = vector([randrange(room.x1, room.x2),
-                          randrange(room.y1, room.y2),
-                          1])
-            self[pos] = Spawn(self.game, pos)
+            for _ in range(monsters):
+                Spawn = self.random.choice([Goblin, Wizard, Gorgon])
+                pos = vector([self.random.randrange(room.x1, room.x2),
+                              self.random.randrange(room.y1, room.y2),
+                              1])
+                if not self[pos].solid:
+                    self[pos] = Spawn(self.game, pos)
 
     def gen_map(self):
         super().gen_map()
@@ -206,16 +432,231 @@ class Dungeon(Maze):
                       Room(br_x, br_y, ROOM_MIN_SIZE, ROOM_MIN_SIZE)]
 
         for _ in range(Dungeon.ATTEMPTS):
-            width = randrange(ROOM_MIN_SIZE, ROOM_MAX_SIZE, 2)
-            height = randrange(ROOM_MIN_SIZE, ROOM_MAX_SIZE, 2)
-            x = randrange(1, self.size[0] - width, 2)
-            y = randrange(1, self.size[1] - height, 2)
+            width = self.random.randrange(ROOM_MIN_SIZE, ROOM_MAX_SIZE, 2)
+            height = self.random.randrange(ROOM_MIN_SIZE, ROOM_MAX_SIZE, 2)
+            x = self.random.randrange(1, self.size[0] - width, 2)
+            y = self.random.randrange(1, self.size[1] - height, 2)
             room = Room(x, y, width, height)
             if not any(map(room.overlaps, self.rooms)):
                 self.rooms.append(room)
 
         for room in self.rooms:
-            self[room.slice] = [[[Dirt(self.game, vector([x, y, 0])),
-                                  Air(self.game, vector([x, y, 1]))]
-                                 for x in range(room.x1, room.x2)]
-                                for y in range(room.y1, room.y2)]
+            xs, ys, zs = room.slice
+            self.kinds[ys, xs, zs] = [Dirt.kind] + [Air.kind] * (self.size[2] - 1)
+
+
+class ChunkedMap(Map):
+    """A world of CHUNK_SIZE square chunks, generated as the player comes near them.
+
+    Only the RESIDENT x RESIDENT block of chunks around the player is held, in a
+    buffer that the wrapped indexing of Map already addresses by world position.
+    Every chunk is built from a seed derived from its coordinates, and its state is
+    stored away when it leaves the block so that it comes back as it was left. The
+    last STORED chunks to leave are kept in memory; older ones are spilled to
+    disk as small Levels, so a long walk costs disk rather than memory. save()
+    writes the resident block and every stored chunk, and a map loaded from it
+    reads spilled chunks back from there.
+    """
+    RESIDENT = 2 * -(-FOV_RADIUS // CHUNK_SIZE) + 1
+    STORED = 256
+    # Dying starts a fresh world rather than reloading a checkpoint
+    persistent = False
+
+    def __init__(self, game_ref, size: vector, from_map: ndarray | Level = None,
+                 seed: int = None):
+        super().__init__(game_ref, size, from_map, seed)
+        self.spill_dir = None
+        if isinstance(from_map, Level):
+            meta = from_map.meta
+            self.seed, self.monsters = meta['seed'], meta['monsters']
+            self.centre = tuple(meta['centre'])
+            self.chunks = {tuple(slot): tuple(chunk) for slot, chunk in meta['chunks']}
+            self.stored = OrderedDict()
+            self.spilled = {tuple(chunk): ChunkedMap.chunk_path(from_map.path, chunk)
+                            for chunk in meta['stored']}
+            # Map revealed buffer indices; the terrain mesh wants world positions
+            self.revealed = []
+            for chunk in self.chunks.values():
+                self.reveal_chunk(chunk)
+
+    def gen_map(self):
+        _, _, z_max = self.size
+        side = ChunkedMap.RESIDENT * CHUNK_SIZE
+        self.seed = self.random.randrange(2**32)
+        self.kinds = full((side, side, z_max), Wall.kind, dtype=uint8)
+        self.chunks = {}
+        # Chunks that left the block: in memory, oldest first, then on disk
+        self.stored = OrderedDict()
+        self.spilled = {}
+        self.centre = None
+        self.monsters = 0
+        self.player_start = vector([1, 1, 1])
+
+    @staticmethod
+    def chunk_path(path: str, chunk: tuple) -> str:
+        return os.path.join(path, 'chunks', '%d_%d' % tuple(chunk))
+
+    def meta(self) -> dict:
+        meta = super().meta()
+        meta.update({'seed': self.seed, 'monsters': self.monsters, 'centre': list(self.centre),
+                     'chunks': [[list(slot), list(chunk)] for slot, chunk in self.chunks.items()],
+                     'stored': [list(chunk) for chunk in (*self.stored, *self.spilled)]})
+        return meta
+
+    def explored_bounds(self) -> None:
+        # Buffer cells are not at their world positions, so chunks are revealed one by one
+        return None
+
+    def save(self, path: str):
+        super().save(path)
+        for chunk in self.stored:
+            self.chunk_level(chunk).save(ChunkedMap.chunk_path(path, chunk))
+        for chunk, source in self.spilled.items():
+            target = ChunkedMap.chunk_path(path, chunk)
+            if os.path.abspath(source) != os.path.abspath(target):
+                Level.load(source).save(target)
+
+    def chunk_level(self, chunk: tuple) -> Level:
+        kinds, explored, entities = self.stored[chunk]
+        arrays = {'kinds': kinds, 'solid': SOLID[kinds], 'transparent': TRANSPARENT[kinds],
+                  'explored': explored}
+        return Level(arrays, Map.entity_table(entities), {'format': Level.FORMAT})
+
+    def reveal_chunk(self, chunk: tuple):
+        """Queue the explored static terrain of a resident chunk for the terrain mesh"""
+        ys, xs = self.chunk_index(chunk)
+        kinds = self.kinds[ys, xs]
+        cells = argwhere(self.explored[ys, xs] & STATIC[kinds])
+        if len(cells):
+            kinds = kinds[tuple(cells.T)]
+            cx, cy = chunk
+            cells[:, :2] += (cy * CHUNK_SIZE, cx * CHUNK_SIZE)
+            self.reveal(cells[:, (1, 0, 2)], kinds)
+
+    def spill(self):
+        """Write the chunks beyond the newest STORED out to disk"""
+        while len(self.stored) > ChunkedMap.STORED:
+            chunk = next(iter(self.stored))
+            if self.spill_dir is None:
+                self.spill_dir = TemporaryDirectory(prefix='rogue-chunks-')
+            path = ChunkedMap.chunk_path(self.spill_dir.name, chunk)
+            self.chunk_level(chunk).save(path)
+            del self.stored[chunk]
+            self.spilled[chunk] = path
+
+    def populate(self, monsters: int = 1):
+        self.monsters = monsters
+        self.recentre(self.player_start)
+        self[self.player_start] = Bonfire(self.game, self.player_start)
+
+    @staticmethod
+    def chunk_of(position: vector) -> tuple:
+        x, y, _ = position
+        return x // CHUNK_SIZE, y // CHUNK_SIZE
+
+    def chunk_index(self, chunk: tuple) -> tuple:
+        cx, cy = chunk
+        side = ChunkedMap.RESIDENT * CHUNK_SIZE
+        x0, y0 = cx * CHUNK_SIZE % side, cy * CHUNK_SIZE % side
+        return slice(y0, y0 + CHUNK_SIZE), slice(x0, x0 + CHUNK_SIZE)
+
+    def recentre(self, position: vector):
+        centre = ChunkedMap.chunk_of(position)
+        if centre == self.centre:
+            return
+        self.centre = cx, cy = centre
+        reach = ChunkedMap.RESIDENT // 2
+        for chunk in product(range(cx - reach, cx + reach + 1), range(cy - reach, cy + reach + 1)):
+            slot = chunk[0] % ChunkedMap.RESIDENT, chunk[1] % ChunkedMap.RESIDENT
+            if self.chunks.get(slot) != chunk:
+                if slot in self.chunks:
+                    self.evict(self.chunks[slot])
+                self.load(chunk)
+                self.chunks[slot] = chunk
+
+    def evict(self, chunk: tuple):
+        cx, cy = chunk
+        x0, y0 = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+        entities = self.entities.region(x0, y0, x0 + CHUNK_SIZE - 1, y0 + CHUNK_SIZE - 1)
+        for entity in entities:
+            self.remove(entity)
+        for key in [key for key in self.tiles if ChunkedMap.chunk_of(key) == chunk]:
+            del self.tiles[key]
+        ys, xs = self.chunk_index(chunk)
+        self.stored[chunk] = self.kinds[ys, xs].copy(), self.explored[ys, xs].copy(), entities
+        self.spill()
+
+    def load(self, chunk: tuple):
+        ys, xs = self.chunk_index(chunk)
+        if chunk in self.stored:
+            kinds, explored, entities = self.stored.pop(chunk)
+            self._set_kinds((ys, xs), kinds)
+            self.explored[ys, xs] = explored
+            for entity in entities:
+                self.add(entity)
+        elif chunk in self.spilled:
+            level = Level.load(self.spilled.pop(chunk))
+            self._set_kinds((ys, xs), array(level.arrays['kinds']))
+            self.explored[ys, xs] = level.arrays['explored']
+            self.spawn_entities(level.entities)
+            # The chunk may come from a saved game the terrain mesh has never seen
+            self.reveal_chunk(chunk)
+        else:
+            cx, cy = chunk
+            rng = default_rng([self.seed, cx % 2**32, cy % 2**32])
+            kinds, rooms = self.gen_chunk(chunk, rng)
+            self._set_kinds((ys, xs), kinds)
+            self.explored[ys, xs] = False
+            if chunk != ChunkedMap.chunk_of(self.player_start):
+                self.populate_chunk(rooms, rng)
+
+    def gen_chunk(self, chunk: tuple, rng) -> tuple:
+        cx, cy = chunk
+        x_max, y_max, z_max = self.size
+        x0, y0 = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+        kinds = full((CHUNK_SIZE, CHUNK_SIZE, z_max), Wall.kind, dtype=uint8)
+        if not (0 <= x0 < x_max and 0 <= y0 < y_max):
+            return kinds, []
+        cells = CHUNK_SIZE // 2
+        walls = kruskal_maze(cells, cells, rng)[:CHUNK_SIZE, :CHUNK_SIZE]
+        # Each chunk owns a door in its left and top edges, which keeps the world connected
+        if cx > 0:
+            walls[2 * rng.integers(cells) + 1, 0] = False
+        if cy > 0:
+            walls[0, 2 * rng.integers(cells) + 1] = False
+        largest = min(ROOM_MAX_SIZE, CHUNK_SIZE - 2)
+        width, height = 2 * rng.integers(ROOM_MIN_SIZE // 2, largest // 2, 2)
+        x, y = 2 * rng.integers(0, [(CHUNK_SIZE - width) // 2, (CHUNK_SIZE - height) // 2]) + 1
+        room = Room(int(x), int(y), int(width), int(height))
+        xs, ys, _ = room.slice
+        walls[ys, xs] = False
+        kinds[~walls] = [Dirt.kind] + [Air.kind] * (z_max - 1)
+        kinds[:, arange(x0, x0 + CHUNK_SIZE) >= x_max] = Wall.kind
+        kinds[arange(y0, y0 + CHUNK_SIZE) >= y_max] = Wall.kind
+        return kinds, [Room(x0 + room.x1, y0 + room.y1, room.w, room.h)]
+
+    def populate_chunk(self, rooms: list, rng):
+        spawns = [Goblin, Wizard, Gorgon]
+        for room in rooms:
+            for _ in range(self.monsters):
+                Spawn = spawns[rng.integers(len(spawns))]
+                pos = vector([int(rng.integers(room.x1, room.x2)),
+                              int(rng.integers(room.y1, room.y2)),
+                              1])
+                if not self[pos].solid:
+                    self[pos] = Spawn(self.game, pos)
+
+    def update(self):
+        self.recentre(self.game.player.position)
+        super().update()
+
+
+MAPS = {Maptype.__name__: Maptype for Maptype in (Maze, Dungeon, ChunkedMap)}
+ENTITIES = {Type.__name__: Type for Type in (Goblin, Troll, Wizard, Gorgon, Ladder, Sword)}
+
+
+def load(game_ref, path: str) -> Map:
+    """A map built over the memory-mapped arrays of a saved level, without its entities"""
+    level = Level.load(path)
+    Maptype = MAPS[level.meta['type']]
+    return Maptype(game_ref, vector(level.meta['size']), from_map=level)
@@ -0,0 +1,60 @@
+#! /usr/bin/env python3
+
+from numpy import (arange, concatenate, flatnonzero, full, iinfo, int32, int64, minimum,
+                   ndarray, ones, zeros)
+from numpy.random import Generator
+
+
+def kruskal_maze(width: int, height: int, rng: Generator) -> ndarray:
+    """A perfect maze of width x height cells as a (2h+1, 2w+1) wall mask.
+
+    Randomised Kruskal, i.e. the minimum spanning tree of the cell grid under
+    random distinct edge weights, found with Boruvka rounds so that every step is
+    a whole-array operation instead of a per-cell walk.
+    """
+    cells = arange(width * height, dtype=int32).reshape(height, width)
+    # Horizontal edges first, then vertical ones
+    us = concatenate((cells[:, :-1].ravel(), cells[:-1, :].ravel()))
+    vs = concatenate((cells[:, 1:].ravel(), cells[1:, :].ravel()))
+    # Random high bits with the edge index as a tie breaker keep the weights distinct
+    weights = rng.integers(0, 2**31, len(us), dtype=int64) << 32 | arange(len(us))
+    chosen = zeros(len(us), dtype=bool)
+    edges, eu, ev = arange(len(us), dtype=int32), us, vs
+    count = width * height
+    unset = iinfo(int64).max
+    while len(edges):
+        weight = weights[edges]
+        best = full(count, unset, dtype=int64)
+        minimum.at(best, eu, weight)
+        minimum.at(best, ev, weight)
+        # Integer index arrays gather much faster than boolean masks here
+        from_u = flatnonzero(best[eu] == weight)
+        from_v = flatnonzero(best[ev] == weight)
+        chosen[edges[from_u]] = chosen[edges[from_v]] = True
+        # Hook every component onto the neighbour across its lightest edge
+        nodes = arange(count, dtype=int32)
+        parent = nodes.copy()
+        parent[eu[from_u]] = ev[from_u]
+        parent[ev[from_v]] = eu[from_v]
+        # Two components that picked the same edge point at each other; keep one as root
+        mutual = parent[flatnonzero((parent[parent] == nodes) & (parent < nodes))]
+        parent[mutual] = mutual
+        while True:
+            grandparent = parent[parent]
+            if (grandparent == parent).all():
+                break
+            parent = grandparent
+        # Contract each tree to a single node and drop the edges inside it
+        roots = parent == nodes
+        label = (roots.cumsum(dtype=int32) - 1)[parent]
+        eu, ev = label[eu], label[ev]
+        crossing = flatnonzero(eu != ev)
+        edges, eu, ev = edges[crossing], eu[crossing], ev[crossing]
+        count = int(roots.sum())
+
+    walls = ones((2 * height + 1, 2 * width + 1), dtype=bool)
+    walls[1::2, 1::2] = False
+    horizontal = height * (width - 1)
+    walls[1::2, 2:-1:2][chosen[:horizontal].reshape(height, width - 1)] = False
+    walls[2:-1:2, 1::2][chosen[horizontal:].reshape(height - 1, width)] = False
+    return walls
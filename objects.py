@@ -1,7 +1,11 @@
 #! /usr/bin/env python3
 
 # from constants import *
-from glwrap import GlObject
+from functools import lru_cache
+
+from numpy import array, ndarray
+
+from protocol import GlObject
 from vector import vector
 
 
@@ -29,8 +33,8 @@ class Object(object, metaclass=UpdateRenderable):
                  solid: bool = True, transparent: bool = None):
         self.game = game_ref
         self.sprite = sprite
-        texid = game_ref.textures['font/%03d.png' % ord(sprite)]
-        self.gl_obj = GlObject(position, texid)
+        self.glyph = game_ref.textures['font/%03d.png' % ord(sprite)]
+        self.gl_obj = GlObject(position, self.glyph)
         self.position = position
         self.solid = solid
         self.transparent = not solid if transparent is None else transparent
@@ -63,12 +67,9 @@ class Object(object, metaclass=UpdateRenderable):
         return self.gl_obj
 
     @staticmethod
-    def bresenham(start: vector, end: vector) -> list:
-        # TODO: Memoise 0 -> (end - start) bresenhams
-        x1, y1, z1 = start
-        x2, y2, z2 = end
-        dx = x2 - x1
-        dy = y2 - y1
+    @lru_cache(maxsize=None)
+    def ray(dx: int, dy: int) -> ndarray:
+        x1, y1, x2, y2 = 0, 0, dx, dy
         is_steep = abs(dy) > abs(dx)
         if is_steep:
             x1, y1 = y1, x1
@@ -84,19 +85,28 @@ class Object(object, metaclass=UpdateRenderable):
         y = y1
         points = []
         for x in range(x1, x2 + 1):
-            coord = vector([y, x, z1]) if is_steep else vector([x, y, z1])
-            points.append(coord)
+            points.append((y, x) if is_steep else (x, y))
             error -= abs(dy)
             if error < 0:
                 y += ystep
                 error += dx
-        return list(reversed(points)) if swapped else points
+        offsets = array(points[::-1] if swapped else points, dtype=int)
+        offsets.setflags(write=False)
+        return offsets
+
+    @staticmethod
+    def bresenham(start: vector, end: vector) -> list:
+        x1, y1, z1 = start
+        x2, y2, z2 = end
+        return [vector([x1 + dx, y1 + dy, z1])
+                for dx, dy in Object.ray(x2 - x1, y2 - y1).tolist()]
 
     def visible(self, other_position: vector) -> int:
         if self.position == other_position:
             return True
-        line_of_sight = self.bresenham(self.position, other_position)[1:-1]
-        if all([self.game.map[x].transparent for x in line_of_sight]):
+        if other_position == self.game.player.position:
+            return self.game.map.fov.visible(self.position)
+        if self.game.map.line_of_sight(self.position, other_position):
             return Object.dist(self.position, other_position)
         return False
 
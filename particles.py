@@ -0,0 +1,77 @@
+#! /usr/bin/env python3
+
+from numpy import array, concatenate, flatnonzero, ndarray, zeros
+from numpy.random import default_rng
+
+from protocol import INSTANCE, GlObject
+
+
+class Particles:
+    """A pool of short-lived visual effects held in preallocated arrays.
+
+    Every live particle drifts by its velocity and counts down its lifespan in one
+    vectorised update per tick. Slots of expired particles go back on a free list
+    and are handed out again, and the pool only grows when it is full.
+    """
+    CAPACITY = 256
+
+    def __init__(self, capacity: int = CAPACITY, seed: int = None):
+        self.seed = seed
+        self._rng = None
+        self.ids = zeros(capacity, dtype='<u4')
+        self.position = zeros((capacity, 3), dtype=int)
+        self.velocity = zeros((capacity, 3), dtype=int)
+        self.lifespan = zeros(capacity, dtype=int)
+        self.glyph = zeros(capacity, dtype='<u2')
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self) -> int:
+        return len(self.lifespan) - len(self.free)
+
+    @property
+    def rng(self):
+        if self._rng is None:
+            self._rng = default_rng(self.seed)
+        return self._rng
+
+    def _grow(self, needed: int):
+        capacity = len(self.lifespan)
+        extra = max(capacity, needed)
+        for name in ('ids', 'position', 'velocity', 'lifespan', 'glyph'):
+            old = getattr(self, name)
+            setattr(self, name, concatenate((old, zeros((extra,) + old.shape[1:],
+                                                        dtype=old.dtype))))
+        self.free[:0] = range(capacity + extra - 1, capacity - 1, -1)
+
+    def spawn(self, position: tuple, glyph: int, lifespan: int, velocity: tuple = (0, 0, 0),
+              count: int = 1, spread: int = 0):
+        """Start count particles at position, each scattered up to spread tiles in x and y"""
+        if len(self.free) < count:
+            self._grow(count - len(self.free))
+        slots = array(self.free[-count:])
+        del self.free[-count:]
+        self.ids[slots] = [next(GlObject.uids) for _ in range(count)]
+        self.position[slots] = position
+        if spread:
+            self.position[slots, :2] += self.rng.integers(-spread, spread + 1, (count, 2))
+        self.velocity[slots] = velocity
+        self.lifespan[slots] = lifespan
+        self.glyph[slots] = glyph
+
+    def update(self):
+        live = flatnonzero(self.lifespan > 0)
+        self.position[live] += self.velocity[live]
+        self.lifespan[live] -= 1
+        self.free.extend(live[self.lifespan[live] == 0].tolist())
+
+    def instances(self, x0: int, y0: int, x1: int, y1: int) -> ndarray:
+        """Render records for the live particles with x0 <= x <= x1 and y0 <= y <= y1"""
+        xs, ys = self.position[:, 0], self.position[:, 1]
+        shown = flatnonzero((self.lifespan > 0) & (x0 <= xs) & (xs <= x1) &
+                            (y0 <= ys) & (ys <= y1))
+        records = zeros(len(shown), dtype=INSTANCE)
+        records['id'] = self.ids[shown]
+        records['position'] = self.position[shown]
+        records['glyph'] = self.glyph[shown]
+        records.sort(order='id')
+        return records
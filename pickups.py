@@ -5,6 +5,7 @@ from effects import Effect
 
 
 class Pickup(Effect):
+    period = None
 
     def __init__(self, *args, solid: bool = False, **kwargs):
         kwargs.update({'solid': solid})
@@ -24,10 +25,6 @@ class Pickup(Effect):
         else:
             return None
 
-    def update(self):
-        if self.game.player.position == self.position:
-            self.pickup()
-
 
 class Ladder(Pickup):
 
@@ -35,10 +32,9 @@ class Ladder(Pickup):
         kwargs.update({'sprite': sprite})
         super().__init__(*args, **kwargs)
 
-    def update(self):
-        if self.game.player.position == self.position:
-            self.game.events.append(LADDER_EVENT)
-        super().update()
+    def pickup(self):
+        self.game.events.append(LADDER_EVENT)
+        super().pickup()
 
 
 class Sword(Pickup):
@@ -0,0 +1,62 @@
+#! /usr/bin/env python3
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+import shutil
+from tempfile import TemporaryDirectory
+
+from protocol import placeholders
+from vector import vector
+
+
+class LevelBuilder:
+    """The little of a GameManager that generating and populating a map needs"""
+
+    def __init__(self):
+        self.textures = placeholders()
+        self.events = []
+        self.map = None
+
+
+def build(Maptype: type, size: vector, seed: int, path: str) -> str:
+    """Generate and populate a level in this process and save it to path"""
+    builder = LevelBuilder()
+    builder.map = Maptype(builder, size, seed=seed)
+    builder.map.populate()
+    builder.map.save(path)
+    return path
+
+
+class Prefetcher:
+    """Builds the next level in a worker process while the current one is played.
+
+    take() hands over the saved level directory, which the game loads in
+    milliseconds, and starts on the level after it. Only the level handed out
+    last and the one being built are kept on disk.
+    """
+
+    def __init__(self, Maptype: type, size: vector):
+        self.Maptype, self.size = Maptype, size
+        self.executor = ProcessPoolExecutor(max_workers=1)
+        self.directory = TemporaryDirectory(prefix='rogue-levels-')
+        self.levels = 0
+        self.pending = None
+        self.current = None
+
+    def request(self, seed: int):
+        self.levels += 1
+        path = os.path.join(self.directory.name, 'level-%d' % self.levels)
+        self.pending = self.executor.submit(build, self.Maptype, self.size, seed, path)
+
+    def take(self, seed: int) -> str:
+        """The prefetched level, waiting for it if it is not ready yet"""
+        path = self.pending.result()
+        if self.current is not None:
+            shutil.rmtree(self.current, ignore_errors=True)
+        self.current = path
+        self.request(seed)
+        return path
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.directory.cleanup()
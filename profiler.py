@@ -0,0 +1,96 @@
+#! /usr/bin/env python3
+
+import atexit
+from collections import defaultdict, deque
+from contextlib import nullcontext
+import json
+import os
+from statistics import mean, quantiles
+from time import perf_counter_ns
+
+# Set to a path prefix to profile, e.g. ROGUE_PROFILE=/tmp/rogue writes /tmp/rogue.game.json
+ENV = 'ROGUE_PROFILE'
+# Set as well to time every actor update, by class
+DETAIL_ENV = 'ROGUE_PROFILE_DETAIL'
+
+
+class Span:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, self.start, perf_counter_ns())
+
+
+class Profiler:
+    """Named timing spans for one process, kept for a Chrome trace and rolling percentiles.
+
+    While disabled, span() hands back one shared no-op context manager, so an
+    instrumented phase costs no more than a call and an empty with block.
+    """
+    MAX_EVENTS = 2**20
+    WINDOW = 1000
+    NULL = nullcontext()
+
+    def __init__(self):
+        self.enabled = self.detail = False
+        self.path = self.process = None
+        self.events = deque(maxlen=Profiler.MAX_EVENTS)
+        self.samples = defaultdict(lambda: deque(maxlen=Profiler.WINDOW))
+
+    def enable(self, path: str, process: str = 'game', detail: bool = False):
+        if not self.enabled:
+            atexit.register(self.write)
+        self.enabled, self.detail = True, detail
+        self.path, self.process = path, process
+        self.events.clear()
+        self.samples.clear()
+
+    def rename(self, process: str):
+        """Start afresh under a new process name, as a forked child inheriting this one"""
+        if self.enabled:
+            self.enable(self.path, process, self.detail)
+
+    def span(self, name: str):
+        if not self.enabled:
+            return Profiler.NULL
+        return Span(self, name)
+
+    def record(self, name: str, start: int, end: int):
+        self.events.append((name, start, end))
+        self.samples[name].append(end - start)
+
+    def stats(self) -> dict:
+        """Mean, p50 and p99 in milliseconds over the last WINDOW samples of each span"""
+        stats = {}
+        for name, samples in sorted(self.samples.items()):
+            ms = [sample / 1e6 for sample in samples]
+            cuts = quantiles(ms, n=100) if len(ms) > 1 else ms * 99
+            stats[name] = {'count': len(ms), 'mean_ms': mean(ms),
+                           'p50_ms': cuts[49], 'p99_ms': cuts[98]}
+        return stats
+
+    def write(self):
+        if not self.enabled:
+            return
+        pid = os.getpid()
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid,
+                   'args': {'name': self.process}}]
+        events += [{'name': name, 'cat': self.process, 'ph': 'X', 'ts': start / 1000,
+                    'dur': (end - start) / 1000, 'pid': pid, 'tid': 0}
+                   for name, start, end in self.events]
+        trace = {'traceEvents': events,
+                 'otherData': {'process': self.process, 'stats': self.stats()}}
+        with open('%s.%s.json' % (self.path, self.process), 'w') as f:
+            json.dump(trace, f)
+
+
+profiler = Profiler()
+if os.environ.get(ENV):
+    profiler.enable(os.environ[ENV], detail=bool(os.environ.get(DETAIL_ENV)))
@@ -0,0 +1,124 @@
+#! /usr/bin/env python3
+
+from collections import namedtuple
+from itertools import count
+from struct import Struct
+
+from numpy import array, concatenate, dtype, frombuffer, isin, ndarray, searchsorted, uint32
+
+from vector import vector
+
+# What the game and GL processes share: glyphs, the objects they are drawn on,
+# and the binary records frames are sent as
+Glyph = namedtuple('Glyph', ['index', 'uv'])
+
+FONT_CODES = range(32, 128)
+FONT_PATHS = ['font/%03d.png' % code for code in FONT_CODES]
+SPRITE_PATHS = ['t1.png', 't2.png']
+
+
+def placeholders(paths: list = FONT_PATHS + SPRITE_PATHS) -> dict:
+    """Glyphs with the same indices as an Atlas of paths, but without building its image"""
+    return {path: Glyph(i, (0.0, 0.0, 0.0, 0.0)) for i, path in enumerate(paths)}
+
+
+class GlObject:
+    vertices = ((0.45, 0.45, -0.45),
+                (-0.45, 0.45, -0.45),
+                (-0.45, 0.45, 0.45),
+                (0.45, 0.45, 0.45),
+                (0.45, -0.45, 0.45),
+                (-0.45, -0.45, 0.45),
+                (-0.45, -0.45, -0.45),
+                (0.45, -0.45, -0.45))
+    corners = ((1.0, 1.0),
+               (0.0, 1.0),
+               (0.0, 0.0),
+               (1.0, 0.0))
+    surfaces = ((0, 1, 2, 3),
+                # (7, 6, 5, 4),
+                # (3, 2, 5, 4),
+                # (1, 0, 7, 6),
+                # (1, 2, 5, 6),
+                # (3, 0, 7, 4),
+                )
+
+    uids = count(1)
+
+    def __init__(self, centre: vector, glyph: Glyph, flags: int = 0):
+        self.uid = next(GlObject.uids)
+        self.position = vector(centre)
+        self.glyph = glyph
+        self.flags = flags
+
+
+INSTANCE = dtype([('id', '<u4'), ('position', '<i4', 3), ('glyph', '<u2'), ('flags', 'u1')])
+# kind, state, removed count, upserted count, camera x, y, z
+HEADER = Struct('<BBIIiii')
+KEYFRAME, DELTA = 0, 1
+STATES = ('game', 'quit')
+
+
+def instances(gl_objs: list) -> ndarray:
+    gl_objs = [obj for obj in gl_objs if obj is not None]
+    records = array([(obj.uid, obj.position, obj.glyph.index, obj.flags) for obj in gl_objs],
+                    dtype=INSTANCE)
+    records.sort(order='id')
+    return records
+
+
+class FrameEncoder:
+    KEYFRAME_INTERVAL = 64
+
+    def __init__(self):
+        self.previous = array([], dtype=INSTANCE)
+        self.frame = 0
+
+    def encode(self, current: ndarray, state: str, camera: vector) -> bytes:
+        """Encode instance records, sorted by id, against the previous frame"""
+        previous = self.previous
+        removed = array([], dtype=uint32)
+        if self.frame % FrameEncoder.KEYFRAME_INTERVAL == 0:
+            kind, upserts = KEYFRAME, current
+        elif not len(previous):
+            kind, upserts = DELTA, current
+        else:
+            kind = DELTA
+            removed = previous['id'][~isin(previous['id'], current['id'])]
+            index = searchsorted(previous['id'], current['id']).clip(max=len(previous) - 1)
+            known = previous[index]
+            unchanged = ((known['id'] == current['id']) &
+                         (known['glyph'] == current['glyph']) &
+                         (known['flags'] == current['flags']) &
+                         (known['position'] == current['position']).all(axis=1))
+            upserts = current[~unchanged]
+        self.previous = current
+        self.frame += 1
+        header = HEADER.pack(kind, STATES.index(state), len(removed), len(upserts), *camera)
+        return header + removed.astype('<u4').tobytes() + upserts.tobytes()
+
+
+class FrameDecoder:
+
+    def __init__(self):
+        self.instances = array([], dtype=INSTANCE)
+        self.state = STATES[0]
+        self.camera = vector([0, 0, 0])
+
+    def decode(self, frame: bytes) -> ndarray:
+        kind, state, n_removed, n_upserts, *camera = HEADER.unpack_from(frame)
+        offset = HEADER.size
+        removed = frombuffer(frame, dtype='<u4', count=n_removed, offset=offset)
+        offset += removed.nbytes
+        upserts = frombuffer(frame, dtype=INSTANCE, count=n_upserts, offset=offset)
+        if kind == KEYFRAME:
+            current = upserts.copy()
+        else:
+            current = self.instances
+            current = current[~isin(current['id'], removed) & ~isin(current['id'], upserts['id'])]
+            current = concatenate((current, upserts))
+            current.sort(order='id')
+        self.instances = current
+        self.state = STATES[state]
+        self.camera = vector(camera)
+        return current
@@ -0,0 +1,82 @@
+#! /usr/bin/env python3
+
+
+class Registry:
+    """Every entity on a map, indexed by exact position and by BUCKET-square buckets.
+
+    Entities are dict keys throughout, so adding, moving and removing one is O(1),
+    at() is a single lookup and area queries only visit the buckets they overlap.
+    """
+    BUCKET = 16
+
+    def __init__(self):
+        self.positions = {}
+        self.cells = {}
+        self.buckets = {}
+
+    def __contains__(self, entity) -> bool:
+        return entity in self.positions
+
+    def __iter__(self):
+        return iter(list(self.positions))
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def items(self):
+        return self.positions.items()
+
+    @staticmethod
+    def bucket(position: tuple) -> tuple:
+        x, y, _ = position
+        return x // Registry.BUCKET, y // Registry.BUCKET
+
+    def add(self, entity, position: tuple = None):
+        position = tuple(entity.position if position is None else position)
+        old = self.positions.get(entity)
+        if old == position:
+            return
+        if old is not None:
+            self._unlink(self.cells, old, entity)
+            if Registry.bucket(old) != Registry.bucket(position):
+                self._unlink(self.buckets, Registry.bucket(old), entity)
+        self.positions[entity] = position
+        self.cells.setdefault(position, {})[entity] = position
+        self.buckets.setdefault(Registry.bucket(position), {})[entity] = position
+
+    def move(self, entity, position: tuple):
+        """Follow an entity to a new position, if it is registered at all"""
+        if entity in self.positions:
+            self.add(entity, position)
+
+    def discard(self, entity):
+        position = self.positions.pop(entity, None)
+        if position is not None:
+            self._unlink(self.cells, position, entity)
+            self._unlink(self.buckets, Registry.bucket(position), entity)
+
+    @staticmethod
+    def _unlink(index: dict, key: tuple, entity):
+        entities = index[key]
+        del entities[entity]
+        if not entities:
+            del index[key]
+
+    def at(self, position: tuple) -> list:
+        return list(self.cells.get(tuple(position), ()))
+
+    def region(self, x0: int, y0: int, x1: int, y1: int) -> list:
+        """Entities with x0 <= x <= x1 and y0 <= y <= y1, on any level"""
+        found = []
+        for bx in range(x0 // Registry.BUCKET, x1 // Registry.BUCKET + 1):
+            for by in range(y0 // Registry.BUCKET, y1 // Registry.BUCKET + 1):
+                bucket = self.buckets.get((bx, by))
+                if bucket:
+                    found.extend(entity for entity, (x, y, _) in bucket.items()
+                                 if x0 <= x <= x1 and y0 <= y <= y1)
+        return found
+
+    def within(self, position: tuple, radius: int) -> list:
+        """Entities no more than radius tiles away along either axis"""
+        x, y, _ = position
+        return self.region(x - radius, y - radius, x + radius, y + radius)
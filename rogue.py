@@ -1,67 +1,198 @@
 #! /usr/bin/env python3
 
+from argparse import ArgumentParser
 from copy import copy
-from multiprocessing import Pipe
-from time import sleep, time
+from multiprocessing import Pipe, Process
+from random import SystemRandom
+from tempfile import TemporaryDirectory
 
 from constants import *
-from glwrap import GlManager
 # from hud import Hud
-from maps import Dungeon
+from level import Level
+import maps
+from maps import ChunkedMap, Dungeon
+from prefetch import Prefetcher
+from profiler import profiler
+from protocol import FrameEncoder
+from scheduler import Scheduler
+from session import RandomStreams, Recorder
+from sharedframes import SharedFrames
 from fighters import Player
 from vector import vector
 
 
 class GameManager:
 
-    def __init__(self, pipe):
+    def __init__(self, pipe, frames: SharedFrames = None, tick_rate: float = TICK_RATE,
+                 map_size: tuple = MAP_SIZE, map_type: type = Dungeon, level_dir: str = None,
+                 prefetch: bool = True, seed: int = None, record: str = None):
         self.pipe = pipe
+        self.seed = SystemRandom().randrange(2**32) if seed is None else seed
+        self.random = RandomStreams(self.seed)
+        self.recorder = None if record is None else Recorder(record, self.seed, map_type,
+                                                              map_size, level_dir)
+        self.level_dir = level_dir
+        self.checkpoint = None
+        self.prefetcher = None
+        self.map_size = vector(map_size)
+        self.frames = frames
+        self.scheduler = Scheduler(tick_rate)
         self.inventory_save = []
         self.state = 'game'
         self.keypresses = {}
-        self.render_objs = []
-        self.init(Dungeon)
+        self.encoder = FrameEncoder()
+        self.init(map_type, self.random['levels'].randrange(2**32))
+        if prefetch and self.map.persistent:
+            self.prefetcher = Prefetcher(type(self.map), self.map_size)
+            self.prefetcher.request(self.random['levels'].randrange(2**32))
 
-    def init(self, Maptype):
+    def init(self, Maptype, seed: int):
+        """Enter a level: the one at level_dir if there is one, else a new one from seed.
+
+        Callers draw seed from the 'levels' stream whichever it is, so that a replay
+        draws the same levels whether or not it finds level_dir already saved.
+        """
         self.events = []
         self.pipe.send('textures')
         self.textures = self.pipe.recv()
-        self.map = Maptype(self, vector([41, 41, 2]))
-        self.map.populate()
+        # Start the GL process's terrain mesh afresh for the new level
+        self.pipe.send('level')
+        if self.level_dir is not None and Level.exists(self.level_dir):
+            self.map = maps.load(self, self.level_dir)
+            self.map.restore()
+        else:
+            self.map = Maptype(self, self.map_size, seed=seed)
+            self.map.populate()
+            # Save the fresh level so that dying reloads it instead of generating another
+            if self.map.persistent:
+                if self.level_dir is None:
+                    self.checkpoint = TemporaryDirectory(prefix='rogue-')
+                    self.level_dir = self.checkpoint.name
+                self.map.save(self.level_dir)
         self.player = Player(self, self.map.player_start)
+        self.map.view()
         for item in self.inventory_save:
             item.game = self
             # self.hud = Hud(self)
 
     def eval_events(self):
         for i, event in enumerate(reversed(self.events)):
-            if event in (QUIT, LADDER_EVENT) or self.keypresses.get(chr(27), 0):
+            if event == QUIT or self.keypresses.get(chr(27), 0):
                 self.state = 'quit'
+            elif event == LADDER_EVENT:
+                self.next_level()
             elif event == PLAYER_KILL:
-                self.init(type(self.map))
+                self.init(type(self.map), self.random['levels'].randrange(2**32))
             elif event == BONFIRE_EVENT:
                 del self.events[-i - 1]
                 self.inventory_save = copy(self.player.inventory)
 
-    def loop(self):
-        while self.state == 'game':
-            t0 = time()
+    def next_level(self):
+        seed = self.random['levels'].randrange(2**32)
+        if self.prefetcher is None:
+            self.level_dir = None
+        else:
+            # The level after next is prefetched from seed; this one was, a level ago
+            self.level_dir = self.prefetcher.take(seed)
+        self.init(type(self.map), seed)
+
+    def close(self):
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+        if self.recorder is not None:
+            self.recorder.close()
+
+    def send_frame(self):
+        with profiler.span('instances'):
+            instances = self.map.instances
+        with profiler.span('send_frame'):
+            terrain = self.map.terrain()
+            if len(terrain):
+                self.pipe.send('terrain')
+                self.pipe.send_bytes(terrain.tobytes())
+            if self.frames is not None:
+                self.frames.write(instances, self.state, self.player.position)
+            else:
+                self.pipe.send('render')
+                self.pipe.send_bytes(self.encoder.encode(instances, self.state,
+                                                         self.player.position))
+
+    def step(self):
+        with profiler.span('keypresses'):
             self.pipe.send('keypresses')
             self.keypresses = self.pipe.recv()
+            if self.recorder is not None:
+                self.recorder.record(self.keypresses)
+        with profiler.span('map.update'):
             self.map.update()
+        with profiler.span('eval_events'):
             self.eval_events()
-            self.pipe.send('render')
-            self.pipe.send([self.map.renders, self.state, self.player.position])
-            sleep_time = 0.125 - (t0 - time())
-            sleep(sleep_time if sleep_time > 0.1 else 0.1)
 
+    def loop(self):
+        while self.state == 'game':
+            for _ in range(self.scheduler.wait()):
+                self.step()
+                if self.state != 'game':
+                    break
+            self.send_frame()
+
+
+def render(pipe, frames: SharedFrames, font: str = None):
+    """The renderer process, which alone imports the GL, windowing and image modules"""
+    from glwrap import GlManager
+    GlManager(pipe, GAME_WIDTH, GAME_HEIGHT, font=font, frames=frames).loop()
+
+
+def main(argv: list = None):
+    parser = ArgumentParser(description='Simple roguelike in Python3/OpenGL')
+    parser.add_argument('--headless', type=int, metavar='TICKS',
+                        help='run TICKS ticks without a display and print timings')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--tick-rate', type=float, metavar='HZ',
+                        help='simulate HZ ticks a second (default %g; with --headless, '
+                             'pace the ticks rather than run them flat out)' % TICK_RATE)
+    parser.add_argument('--record', metavar='FILE',
+                        help='log the seed and every tick of keypresses to FILE')
+    parser.add_argument('--replay', metavar='FILE',
+                        help='replay a recorded session without a display and print timings')
+    parser.add_argument('--chunked', action='store_true',
+                        help='play in a large world generated chunk by chunk')
+    parser.add_argument('--level', metavar='DIR',
+                        help='play the level saved in DIR, or save the new level there')
+    parser.add_argument('--font', metavar='TTF',
+                        help='draw the character glyphs with the TrueType font TTF instead of font/')
+    parser.add_argument('--profile', metavar='PREFIX',
+                        help='write a Chrome trace of each process to PREFIX.<process>.json')
+    parser.add_argument('--profile-classes', action='store_true',
+                        help='with --profile, also time every actor update by class')
+    args = parser.parse_args(argv)
+    if args.profile is not None:
+        profiler.enable(args.profile, detail=args.profile_classes)
+    options = {'map_size': WORLD_SIZE, 'map_type': ChunkedMap} if args.chunked else {}
+    options['level_dir'] = args.level
+    if args.tick_rate is not None:
+        options['tick_rate'] = args.tick_rate
+    if args.replay is not None:
+        import headless
+        print(headless.replay(args.replay))
+        return
+    if args.headless is not None:
+        import headless
+        print(headless.run(args.headless, seed=args.seed or 0, **options))
+        return
 
-def main():
     game_pipe, gl_pipe = Pipe()
-    gl = GlManager(gl_pipe, GAME_WIDTH, GAME_HEIGHT)
-    gl.loop()
-    game = GameManager(game_pipe)
-    game.loop()
+    frames = SharedFrames()
+    Process(target=render, args=(gl_pipe, frames, args.font)).start()
+    game = GameManager(game_pipe, frames, seed=args.seed, record=args.record, **options)
+    try:
+        game.loop()
+    finally:
+        game.close()
+        print('%(ticks)d ticks at %(rate)g Hz, %(late)d late, %(skipped)d skipped'
+              % game.scheduler.stats)
+        frames.close()
+        frames.unlink()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,113 @@
+#! /usr/bin/env python3
+
+from time import monotonic, sleep
+
+
+class Scheduler:
+    """Fixed-timestep tick scheduler on the monotonic clock.
+
+    wait() blocks until the next tick is due and returns how many ticks to
+    simulate. A loop that falls behind catches up by at most MAX_CATCHUP ticks
+    at once, and any older backlog is counted as skipped and dropped. Both
+    stats count ticks: late is the ticks simulated more than LATE_TOLERANCE
+    after their deadline, skipped the ticks never simulated at all.
+    """
+    MAX_CATCHUP = 4
+    LATE_TOLERANCE = 0.002
+
+    def __init__(self, rate: float = None, max_catchup: int = MAX_CATCHUP,
+                 clock=monotonic, sleep=sleep):
+        self.clock, self.sleep = clock, sleep
+        self.max_catchup = max_catchup
+        self.deadline = None
+        self.ticks = self.late = self.skipped = 0
+        self.rate = rate
+
+    def _get_rate(self) -> float:
+        return self._rate
+
+    def _set_rate(self, rate: float):
+        self._rate = rate
+        self.period = 1 / rate if rate else None
+        self.deadline = None
+
+    rate = property(_get_rate, _set_rate)
+
+    @property
+    def stats(self) -> dict:
+        return {'rate': self.rate, 'ticks': self.ticks,
+                'late': self.late, 'skipped': self.skipped}
+
+    def wait(self) -> int:
+        if self.period is None:
+            self.ticks += 1
+            return 1
+        now = self.clock()
+        if self.deadline is None:
+            self.deadline = now
+        late = 0
+        if now < self.deadline:
+            self.sleep(self.deadline - now)
+            due = 1
+        else:
+            lag = now - self.deadline
+            due = int(lag / self.period) + 1
+            # All but the newest due tick are a whole period or more behind
+            late = due - 1 + (lag - (due - 1) * self.period > Scheduler.LATE_TOLERANCE)
+        if due > self.max_catchup:
+            # The oldest, and so late, ticks are the ones dropped
+            skipped = due - self.max_catchup
+            self.skipped += skipped
+            late -= skipped
+            due = self.max_catchup
+            self.deadline = now + self.period
+        else:
+            self.deadline += due * self.period
+        self.late += late
+        self.ticks += due
+        return due
+
+
+class TimingWheel:
+    """Actors bucketed by the tick they are next due, in a ring of SLOTS buckets.
+
+    schedule() and cancel() are O(1) and advance() only visits the bucket of the
+    new tick, so the cost of a tick follows the number of actors due in it. An
+    actor due more than SLOTS ticks ahead simply waits out the extra turns.
+    """
+    SLOTS = 64
+
+    def __init__(self, slots: int = SLOTS):
+        self.tick = 0
+        self.slots = [{} for _ in range(slots)]
+        self.due = {}
+
+    def __contains__(self, actor) -> bool:
+        return actor in self.due
+
+    def __len__(self) -> int:
+        return len(self.due)
+
+    def schedule(self, actor, delay: int = 1):
+        self.cancel(actor)
+        tick = self.tick + max(delay, 1)
+        self.due[actor] = tick
+        self.slots[tick % len(self.slots)][actor] = tick
+
+    def cancel(self, actor):
+        tick = self.due.pop(actor, None)
+        if tick is not None:
+            del self.slots[tick % len(self.slots)][actor]
+
+    def advance(self):
+        """Move on one tick and yield the actors due in it, unscheduling each as it goes.
+
+        An actor cancelled by an earlier one during the same tick is skipped.
+        """
+        self.tick += 1
+        slot = self.slots[self.tick % len(self.slots)]
+        for actor in [actor for actor, tick in slot.items() if tick == self.tick]:
+            if self.due.get(actor) == self.tick:
+                del slot[actor]
+                del self.due[actor]
+                yield actor
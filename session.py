@@ -0,0 +1,49 @@
+#! /usr/bin/env python3
+
+import json
+import os
+from random import Random
+
+
+class RandomStreams:
+    """One random.Random per subsystem, each seeded from the game seed and its name.
+
+    Streams are independent, so adding draws to one subsystem (say, monster AI)
+    leaves the sequence every other subsystem sees unchanged.
+    """
+
+    def __init__(self, seed: int):
+        self.seed = seed
+        self.streams = {}
+
+    def __getitem__(self, name: str) -> Random:
+        if name not in self.streams:
+            self.streams[name] = Random('%d/%s' % (self.seed, name))
+        return self.streams[name]
+
+
+class Recorder:
+    """Logs a session as JSON lines: a header with the seed and every other option
+    that decides the game's state, then the keypresses of every tick"""
+
+    def __init__(self, path: str, seed: int, map_type: type, map_size: tuple,
+                 level_dir: str = None):
+        self.file = open(path, 'w')
+        self.write({'seed': seed, 'map_type': map_type.__name__, 'map_size': list(map_size),
+                    'level_dir': None if level_dir is None else os.path.abspath(level_dir)})
+
+    def write(self, line: dict):
+        self.file.write(json.dumps(line) + '\n')
+
+    def record(self, keypresses: dict):
+        self.write(keypresses)
+
+    def close(self):
+        self.file.close()
+
+
+def read_session(path: str) -> tuple:
+    """The header and the list of per-tick keypresses of a recorded session"""
+    with open(path) as f:
+        header, *ticks = [json.loads(line) for line in f if line.strip()]
+    return header, ticks
@@ -0,0 +1,83 @@
+#! /usr/bin/env python3
+
+from multiprocessing.shared_memory import SharedMemory
+
+from numpy import dtype, ndarray
+
+from protocol import STATES
+from vector import vector
+
+SEQUENCE = dtype('<u8')
+# written is the sequence of the frame the buffer holds, or 0 while it is being filled
+HEADER = dtype([('written', SEQUENCE), ('count', '<u4'), ('state', 'u1'), ('camera', '<i4', 3)])
+
+
+class SharedFrames:
+    """Double-buffered instance arrays in shared memory, published with a sequence counter.
+
+    The writer fills buffer (sequence + 1) % 2 and only then bumps the sequence.
+    Each buffer's header also records which frame it holds, cleared while the
+    writer refills it, so a reader that was lapped mid-copy sees the change and
+    retries; a frame is never returned torn between two writes.
+    """
+    CAPACITY = 4096
+
+    def __init__(self, capacity: int = CAPACITY, name: str = None):
+        self.capacity = capacity
+        fields = [('position', '<i4', (capacity, 3)), ('glyph', '<u2', capacity),
+                  ('flags', 'u1', capacity)]
+        self.layout = dtype([('sequence', SEQUENCE), ('headers', HEADER, 2),
+                             ('buffers', dtype(fields), 2)])
+        if name is None:
+            self.shm = SharedMemory(create=True, size=self.layout.itemsize)
+        else:
+            self.shm = SharedMemory(name=name)
+        self.view = ndarray((), dtype=self.layout, buffer=self.shm.buf)
+
+    def __reduce__(self):
+        return SharedFrames, (self.capacity, self.shm.name)
+
+    @property
+    def sequence(self) -> int:
+        return int(self.view['sequence'])
+
+    def write(self, instances: ndarray, state: str, camera: vector):
+        sequence = self.sequence + 1
+        count = min(len(instances), self.capacity)
+        header = self.view['headers'][sequence % 2]
+        buffer = self.view['buffers'][sequence % 2]
+        header['written'] = 0
+        buffer['position'][:count] = instances['position'][:count]
+        buffer['glyph'][:count] = instances['glyph'][:count]
+        buffer['flags'][:count] = instances['flags'][:count]
+        header['count'] = count
+        header['state'] = STATES.index(state)
+        header['camera'] = camera
+        header['written'] = sequence
+        self.view['sequence'] = sequence
+
+    def read(self, last_sequence: int = 0):
+        """The newest frame as (sequence, positions, glyphs, flags, state, camera),
+        or None if nothing was published since last_sequence"""
+        while True:
+            sequence = self.sequence
+            if sequence == last_sequence:
+                return None
+            header = self.view['headers'][sequence % 2]
+            buffer = self.view['buffers'][sequence % 2]
+            if int(header['written']) != sequence:
+                continue
+            count = int(header['count'])
+            frame = (sequence, buffer['position'][:count].copy(), buffer['glyph'][:count].copy(),
+                     buffer['flags'][:count].copy(), STATES[header['state']],
+                     vector(header['camera'].tolist()))
+            # The writer may have started refilling this buffer while it was being copied
+            if int(header['written']) == sequence:
+                return frame
+
+    def close(self):
+        del self.view
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
@@ -0,0 +1,144 @@
+#! /usr/bin/env python3
+
+from numpy import argwhere, array, empty, float32, ndarray, zeros
+
+from atlas import Atlas
+from constants import CHUNK_SIZE
+
+# Half the width of an object's top face; the rest of each cell is a gap
+FACE = 0.45
+# A terrain texture is one cell: the glyph, shrunk to the face, in a black border
+BORDER = 0.5 - FACE
+# (u, v) of the corners of a top face, in the order the vertices are emitted
+CORNERS = array([(1, 1), (0, 1), (0, 0), (1, 0)], dtype=float32)
+
+
+def greedy_quads(mask: ndarray) -> list:
+    """Cover the set cells of a 2D mask with few rectangles, as (row, col, rows, cols).
+
+    Each rectangle starts at the first uncovered cell in row-major order, grows
+    along the row as far as it can, then down for as long as every cell beneath
+    is set and uncovered as well.
+    """
+    mask = mask.copy()
+    rows, cols = mask.shape
+    quads = []
+    for row, col in argwhere(mask).tolist():
+        if not mask[row, col]:
+            continue
+        width = 1
+        while col + width < cols and mask[row, col + width]:
+            width += 1
+        height = 1
+        while row + height < rows and mask[row + height, col:col + width].all():
+            height += 1
+        mask[row:row + height, col:col + width] = False
+        quads.append((row, col, height, width))
+    return quads
+
+
+class TerrainMesh:
+    """Explored static terrain as greedily merged quads, one vertex array per glyph.
+
+    Cells are kept in CHUNK_SIZE square chunks per glyph and layer. add() marks
+    cells, and only the chunks it touched are meshed again by remesh(). Each
+    chunk owns a slot of its glyph's array, sized to a power of two of quads,
+    and is rewritten in place while it fits, so a tick's newly explored cells
+    change a few small ranges however much of the level is already explored.
+    Unused vertices are zero, making degenerate quads that draw nothing. A
+    quad's uvs run from 0 to its size in cells, for a texture that repeats
+    once per cell.
+    """
+    CAPACITY = 1024
+
+    def __init__(self, chunk: int = CHUNK_SIZE):
+        self.chunk = chunk
+        self.cells = {}
+        self.stale = set()
+        # Vertex arrays and how much of each is in use, by glyph
+        self.arrays = {}
+        self.used = {}
+        # The (start, size) vertex range of each chunk in its glyph's array
+        self.slots = {}
+
+    def clear(self):
+        self.cells.clear()
+        self.stale.clear()
+        self.arrays.clear()
+        self.used.clear()
+        self.slots.clear()
+
+    def add(self, positions: ndarray, glyphs: ndarray):
+        """Mark (N, 3) map positions as explored terrain with (N,) glyph indices"""
+        chunk = self.chunk
+        for (x, y, z), glyph in zip(positions.tolist(), glyphs.tolist()):
+            (cx, lx), (cy, ly) = divmod(x, chunk), divmod(y, chunk)
+            key = (glyph, z, cy, cx)
+            if key not in self.cells:
+                self.cells[key] = zeros((chunk, chunk), dtype=bool)
+            self.cells[key][ly, lx] = True
+            self.stale.add(key)
+
+    def remesh(self) -> dict:
+        """Mesh the chunks changed since the last call into their glyphs' arrays.
+
+        Returns the (start, end) vertex ranges written, by glyph, or None for a
+        glyph whose array was reallocated and so changed as a whole.
+        """
+        changed = {}
+        for key in self.stale:
+            glyph, z, cy, cx = key
+            quads = array(greedy_quads(self.cells[key]), dtype=float32).reshape(-1, 4)
+            vertices = TerrainMesh.vertices(quads, cx * self.chunk, cy * self.chunk, z)
+            start, size = self.slots.get(key, (0, 0))
+            if len(vertices) > size:
+                if size:
+                    self.arrays[glyph][start:start + size] = 0
+                    TerrainMesh.mark(changed, glyph, start, size)
+                start, size = self.allocate(glyph, len(vertices), changed)
+                self.slots[key] = start, size
+            self.arrays[glyph][start:start + len(vertices)] = vertices
+            self.arrays[glyph][start + len(vertices):start + size] = 0
+            TerrainMesh.mark(changed, glyph, start, size)
+        self.stale.clear()
+        return changed
+
+    @staticmethod
+    def mark(changed: dict, glyph: int, start: int, size: int):
+        if glyph not in changed:
+            changed[glyph] = []
+        if changed[glyph] is not None:
+            changed[glyph].append((start, start + size))
+
+    def allocate(self, glyph: int, count: int, changed: dict) -> tuple:
+        """A new slot at the end of glyph's array for at least count vertices,
+        growing the array (and marking it changed as a whole) if it is full"""
+        size = Atlas.power_of_two(count)
+        start = self.used.get(glyph, 0)
+        vertices = self.arrays.get(glyph)
+        if vertices is None or start + size > len(vertices):
+            capacity = max(TerrainMesh.CAPACITY, Atlas.power_of_two(start + size))
+            grown = zeros((capacity, 5), dtype=float32)
+            if vertices is not None:
+                grown[:start] = vertices[:start]
+            self.arrays[glyph] = grown
+            changed[glyph] = None
+        self.used[glyph] = start + size
+        return start, size
+
+    @staticmethod
+    def vertices(quads: ndarray, x0: int, y0: int, z: int) -> ndarray:
+        """The top faces of (row, col, rows, cols) quads of a chunk at (x0, y0) on layer z"""
+        rows, cols, heights, widths = quads.T
+        # Map (x, y, z) is GL (x, z, y), and each quad reaches the edges of its cells
+        x_lo, y_lo = x0 + cols - 0.5, y0 + rows - 0.5
+        xs = (x_lo + widths, x_lo, x_lo, x_lo + widths)
+        ys = (y_lo, y_lo, y_lo + heights, y_lo + heights)
+        vertices = empty((len(quads), len(CORNERS), 5), dtype=float32)
+        for i, (u, v) in enumerate(CORNERS):
+            vertices[:, i, 0] = u * widths
+            vertices[:, i, 1] = v * heights
+            vertices[:, i, 2] = xs[i]
+            vertices[:, i, 3] = z + FACE
+            vertices[:, i, 4] = ys[i]
+        return vertices.reshape(-1, 5)
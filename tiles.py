@@ -1,15 +1,31 @@
 #! /usr/bin/env python3
 
+from numpy import array
+
 from constants import *
 from effects import BonfireFlame
 from objects import Object
 
 
 class Tile(Object):
+    kind = None
+    sprite = ' '
+    solid = True
+    period = None
 
     def __init__(self, *args, **kwargs):
+        kwargs.setdefault('sprite', self.sprite)
+        kwargs.setdefault('solid', self.solid)
         super().__init__(*args, **kwargs)
-        self.explored = False
+        self.gl_obj.flags = TERRAIN_FLAG
+
+    def _get_explored(self) -> bool:
+        return bool(self.game.map.explored[self.game.map.cell(self.position)])
+
+    def _set_explored(self, explored: bool):
+        self.game.map.explored[self.game.map.cell(self.position)] = explored
+
+    explored = property(_get_explored, _set_explored)
 
     @property
     def render(self):
@@ -18,6 +34,9 @@ class Tile(Object):
         else:
             return None
 
+    def enter(self, fighter):
+        pass
+
     def update(self):
         if not self.explored:
             if self.visible(self.game.player.position):
@@ -25,10 +44,8 @@ class Tile(Object):
 
 
 class Air(Tile):
-
-    def __init__(self, *args, sprite: str = ' ', solid: bool = False, **kwargs):
-        kwargs.update({'sprite': sprite, 'solid': solid})
-        super().__init__(*args, **kwargs)
+    kind = 0
+    sprite, solid = ' ', False
 
     @property
     def render(self):
@@ -36,28 +53,38 @@ class Air(Tile):
 
 
 class Dirt(Tile):
-
-    def __init__(self, *args, sprite: str = '.', solid: bool = False, **kwargs):
-        kwargs.update({'sprite': sprite, 'solid': solid})
-        super().__init__(*args, **kwargs)
+    kind = 1
+    sprite, solid = '.', False
 
 
 class Wall(Tile):
-
-    def __init__(self, *args, sprite: str = '#', solid: bool = True, **kwargs):
-        kwargs.update({'sprite': sprite, 'solid': solid})
-        super().__init__(*args, **kwargs)
+    kind = 2
+    sprite, solid = '#', True
 
 
 class Bonfire(Tile):
+    kind = 3
+    sprite, solid = 'x', False
 
-    def __init__(self, *args, sprite: str = 'x', solid: bool = False, **kwargs):
-        kwargs.update({'sprite': sprite, 'solid': solid})
-        super().__init__(*args, **kwargs)
+    @property
+    def period(self) -> int:
+        return 1 if self.position == self.game.player.position else None
+
+    def enter(self, fighter):
+        self.game.map.actors.schedule(self)
 
     def update(self):
         if self.position == self.game.player.position:
             self.game.events.append(BONFIRE_EVENT)
-        # for _ in range(3):
-        #     BonfireFlame(self.game, self.position).spawn()
+            BonfireFlame.spawn(self.game, self.position, count=3)
         super().update()
+
+
+# Lookup tables indexed by Tile.kind, used to derive the per-cell arrays of a Map
+TILES = (Air, Dirt, Wall, Bonfire)
+SPRITES = array([tile.sprite for tile in TILES])
+SOLID = array([tile.solid for tile in TILES], dtype=bool)
+TRANSPARENT = ~SOLID
+RENDERED = array([tile is not Air for tile in TILES], dtype=bool)
+# Unchanging once explored, so drawn from the GL process's terrain mesh, not every frame
+STATIC = array([tile in (Dirt, Wall) for tile in TILES], dtype=bool)
@@ -1,64 +1,142 @@
 #! /usr/bin/env python3
 
+from types import GeneratorType
 
-class vector(list):
-    from types import GeneratorType as generator
-    iterable = (tuple, list, generator)
+from numpy import asarray, integer, ndarray
 
-    def __init__(self, *args):
-        super().__init__(*args)
-        assert len(self) == 3
+_new = tuple.__new__
+
+
+class vector(tuple):
+    __slots__ = ()
+    iterable = (tuple, list, GeneratorType)
+
+    def __new__(cls, iterable=(0, 0, 0)):
+        x, y, z = iterable
+        return _new(cls, (x, y, z))
 
     def __copy__(self):
-        return self.__class__(tuple(self))
+        return self
 
     def __or__(self, other):
-        return vector(list(self) + list(other))
+        return vector(tuple(self) + tuple(other))
 
     def __eq__(self, other):
+        if isinstance(other, tuple):
+            return tuple.__eq__(self, other)
         if isinstance(other, vector.iterable):
-            return all(map(lambda x, y: x == y, self, other))
+            return tuple.__eq__(self, tuple(other))
         return False
 
-    def __getitem__(self, sl):
-        if isinstance(sl, slice):
-            return vector(super().__getitem__(sl))
-        else:
-            return super().__getitem__(sl)
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = tuple.__hash__
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return vector(tuple.__getitem__(self, index))
+        return tuple.__getitem__(self, index)
 
     def __add__(self, other):
+        x, y, z = self
         if isinstance(other, vector.iterable):
-            return vector(map(lambda x, y: x + y, self, other))
-        return vector(map(lambda x: x + other, self))
-
-    def __iadd__(self, other):
-        return self + other
+            u, v, w = other
+            return _new(vector, (x + u, y + v, z + w))
+        return _new(vector, (x + other, y + other, z + other))
 
     def __neg__(self):
-        return vector(map(lambda x: -x, self))
+        x, y, z = self
+        return _new(vector, (-x, -y, -z))
 
     def __sub__(self, other):
+        x, y, z = self
         if isinstance(other, vector.iterable):
-            return self + (-x for x in other)
-        else:
-            return self + other.__neg__()
+            u, v, w = other
+            return _new(vector, (x - u, y - v, z - w))
+        return _new(vector, (x - other, y - other, z - other))
 
     def __mul__(self, other):
+        x, y, z = self
         if isinstance(other, vector.iterable):
-            return vector(map(lambda x, y: x * y, self, other))
-        return vector(map(lambda x: x * other, self))
+            u, v, w = other
+            return _new(vector, (x * u, y * v, z * w))
+        return _new(vector, (x * other, y * other, z * other))
 
     def __truediv__(self, other):
+        x, y, z = self
         if isinstance(other, vector.iterable):
-            return vector(map(lambda x, y: x / y, self, other))
-        return vector(map(lambda x: x / other, self))
+            u, v, w = other
+            return _new(vector, (x / u, y / v, z / w))
+        return _new(vector, (x / other, y / other, z / other))
 
     def __floordiv__(self, other):
+        x, y, z = self
         if isinstance(other, vector.iterable):
-            return vector(map(lambda x, y: x // y, self, other))
-        return vector(map(lambda x: x // other, self))
+            u, v, w = other
+            return _new(vector, (x // u, y // v, z // w))
+        return _new(vector, (x // other, y // other, z // other))
 
     def __pow__(self, other):
+        x, y, z = self
         if isinstance(other, vector.iterable):
-            return vector(map(lambda x, y: x ** y, self, other))
-        return vector(map(lambda x: x // other, self))
+            u, v, w = other
+            return _new(vector, (x ** u, y ** v, z ** w))
+        return _new(vector, (x ** other, y ** other, z ** other))
+
+
+class vectors:
+    """A batch of vectors backed by an (N, 3) array, with the same operators as vector"""
+    __slots__ = ('array',)
+
+    def __init__(self, iterable=(), dtype=int):
+        self.array = asarray(iterable, dtype=dtype).reshape(-1, 3)
+
+    @staticmethod
+    def _wrap(array: ndarray):
+        batch = object.__new__(vectors)
+        batch.array = array
+        return batch
+
+    @staticmethod
+    def _operand(other):
+        if isinstance(other, vectors):
+            return other.array
+        if isinstance(other, vector.iterable):
+            return asarray(tuple(other))
+        return other
+
+    def __len__(self):
+        return len(self.array)
+
+    def __iter__(self):
+        return (_new(vector, row) for row in self.array.tolist())
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, integer)):
+            return _new(vector, self.array[index].tolist())
+        return vectors._wrap(self.array[index])
+
+    def __eq__(self, other) -> ndarray:
+        return (self.array == vectors._operand(other)).all(axis=1)
+
+    def __add__(self, other):
+        return vectors._wrap(self.array + vectors._operand(other))
+
+    def __neg__(self):
+        return vectors._wrap(-self.array)
+
+    def __sub__(self, other):
+        return vectors._wrap(self.array - vectors._operand(other))
+
+    def __mul__(self, other):
+        return vectors._wrap(self.array * vectors._operand(other))
+
+    def __truediv__(self, other):
+        return vectors._wrap(self.array / vectors._operand(other))
+
+    def __floordiv__(self, other):
+        return vectors._wrap(self.array // vectors._operand(other))
+
+    def __pow__(self, other):
+        return vectors._wrap(self.array ** vectors._operand(other))